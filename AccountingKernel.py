@@ -0,0 +1,134 @@
+import numpy as np
+from config import config_commission_rate
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        # Without numba the kernels run as plain Python with the same arithmetic
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+NO_ERROR = 0
+BUY_EXCEEDS_SHORT = 1
+SELL_EXCEEDS_LONG = 2
+
+ERROR_MESSAGES = {
+    BUY_EXCEEDS_SHORT: "Trying to buy more than what was shorted.",
+    SELL_EXCEEDS_LONG: "Trying to sell more than current long position.",
+}
+
+
+@njit(cache=True)
+def fill(shares, avg_price, quantity, price, multiplier, strike, commission_rate):
+    """
+    Apply one fill to a position: quantity > 0 buys, quantity < 0 sells.
+    Covers shorts, adds to longs or opens a position, as Broker.buy_option / sell_option.
+    Returns (shares, avg_price, cash_delta, error); shares == 0 means the position is closed.
+    """
+    if quantity > 0:
+        total_cost = price * quantity * multiplier
+        commission = strike * quantity * commission_rate
+        total_cost += commission
+        if shares < 0:  # Short cover
+            if quantity <= -shares:
+                return shares + quantity, avg_price, -total_cost, NO_ERROR
+            return shares, avg_price, 0.0, BUY_EXCEEDS_SHORT
+        if shares > 0:  # Long add: per-unit average price, weighted by shares
+            new_shares = shares + quantity
+            return new_shares, (avg_price * shares + price * quantity) / new_shares, -total_cost, NO_ERROR
+        return quantity, price, -total_cost, NO_ERROR
+
+    quantity = -quantity
+    total_revenue = price * quantity * multiplier
+    commission = strike * quantity * commission_rate
+    total_revenue -= commission
+    if shares > 0:  # Long reduce
+        if shares >= quantity:
+            return shares - quantity, avg_price, total_revenue, NO_ERROR
+        return shares, avg_price, 0.0, SELL_EXCEEDS_LONG
+    if shares < 0:  # Short add: per-unit average price, weighted by shares
+        new_shares = shares - quantity
+        return new_shares, (avg_price * -shares + price * quantity) / -new_shares, total_revenue, NO_ERROR
+    return -quantity, price, total_revenue, NO_ERROR
+
+
+@njit(cache=True)
+def apply_fills(cash, shares, avg_price, cids, quantities, prices, strikes, multipliers, commission_rate):
+    """
+    Apply a batch of fills in order to array-backed positions indexed by cid, in place.
+    Returns (cash, failed_order, error); on error the fills before failed_order are kept.
+    """
+    for i in range(len(cids)):
+        cid = cids[i]
+        new_shares, new_avg_price, cash_delta, error = fill(shares[cid], avg_price[cid], quantities[i], prices[i],
+                                                            multipliers[cid], strikes[cid], commission_rate)
+        if error != NO_ERROR:
+            return cash, i, error
+        shares[cid] = new_shares
+        avg_price[cid] = new_avg_price if new_shares != 0 else 0.0
+        cash += cash_delta
+    return cash, -1, NO_ERROR
+
+
+@njit(cache=True)
+def mark(cash, shares, avg_price, prices, strikes, multipliers):
+    """
+    Portfolio, premium and nominal value of the positions, summed in array order.
+    Zero-share entries are skipped.
+    """
+    total_value = cash
+    premium_value = 0.0
+    nominal_value = 0.0
+    for i in range(len(shares)):
+        if shares[i] > 0:  # Long position
+            total_value += prices[i] * shares[i] * multipliers[i]
+            premium_value += avg_price[i] * shares[i] * multipliers[i]
+            nominal_value += strikes[i] * shares[i] * multipliers[i]
+        elif shares[i] < 0:  # Short position
+            total_value -= prices[i] * abs(shares[i]) * multipliers[i]
+            premium_value -= avg_price[i] * abs(shares[i]) * multipliers[i]
+            nominal_value += strikes[i] * abs(shares[i]) * multipliers[i]
+    return total_value, premium_value, nominal_value
+
+
+class AccountingBook:
+    def __init__(self, contracts, init_cash=0.0, commission_rate=config_commission_rate):
+        """
+        Array-backed positions over all contracts of a ContractMaster, for path-dependent sweeps
+        that apply order batches without the per-order Python overhead of Broker.
+        """
+        self._strikes = np.nan_to_num(contracts.strike)
+        self._multipliers = contracts.multiplier.astype(np.float64)
+        self._commission_rate = commission_rate
+        self.cash = float(init_cash)
+        self.shares = np.zeros(len(contracts), dtype=np.int64)
+        self.avg_price = np.zeros(len(contracts), dtype=np.float64)
+
+    def apply(self, cids, quantities, prices):
+        """
+        Fill a batch of orders (quantity > 0 buys, < 0 sells) at the given prices.
+        """
+        cids = np.asarray(cids, dtype=np.int64)
+        self.cash, failed_order, error = apply_fills(self.cash, self.shares, self.avg_price, cids,
+                                                     np.asarray(quantities, dtype=np.int64),
+                                                     np.asarray(prices, dtype=np.float64),
+                                                     self._strikes, self._multipliers, self._commission_rate)
+        if error != NO_ERROR:
+            raise ValueError(f"{ERROR_MESSAGES[error]} (order {failed_order}, cid {cids[failed_order]})")
+
+    def mark(self, prices):
+        """
+        (portfolio_value, premium_value, nominal_value) with prices given per cid.
+        """
+        held = np.flatnonzero(self.shares)
+        return mark(self.cash, self.shares[held], self.avg_price[held], np.asarray(prices, dtype=np.float64)[held],
+                    self._strikes[held], self._multipliers[held])
+
+    def positions(self) -> dict:
+        return {int(cid): {'shares': int(self.shares[cid]), 'avg_price': float(self.avg_price[cid])}
+                for cid in np.flatnonzero(self.shares)}
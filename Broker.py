@@ -63,6 +63,7 @@ class Base_Broker(Broker):
         super().__init__(init_cash, exchange)
         self._premium_value = 0.0
         self._nominal_value = 0.0
+        self._margin_value = 0.0
 
     @property
     def nominal_value(self) -> float:
@@ -72,6 +73,14 @@ class Base_Broker(Broker):
     def nominal_value(self, value: float) -> None:
         self._nominal_value = value
 
+    @property
+    def margin_value(self) -> float:
+        return self._margin_value
+
+    @margin_value.setter
+    def margin_value(self, value: float) -> None:
+        self._margin_value = value
+
     @property
     def premium_value(self) -> float:
         return self._premium_value
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 import warnings
 from enums import AssetTypes
+from config import config_underlying_map
 import numpy as np
 
 warnings.filterwarnings("ignore")
@@ -124,7 +125,7 @@ combined_data_options = combined_data[combined_data['type'] == AssetTypes.Option
 combined_data_options['strike_price'] = combined_data_options['uni_id'].apply(lambda x: x.split('-')[-1]).astype(int)
 combined_data_options['option_type'] = combined_data_options['uni_id'].apply(lambda x: x.split('-')[1]).astype(str)
 combined_data_options['underlying_id'] = combined_data_options['uni_id'].apply(lambda x: x.split('-')[0]).astype(str)
-replace_map = {'HO': 'IH', 'IO': 'IF', 'MO': 'IM'}
+replace_map = config_underlying_map
 
 
 def replace_prefix(underlying_id):
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from config import config_contract_multiplier, config_future_multiplier
+from enums import AssetTypes
+
+
+class ContractMaster:
+    _fields = ['uni_id', 'asset_type', 'strike', 'option_type', 'underlying_id', 'listed_date', 'expiry',
+               'multiplier']
+
+    def __init__(self, uni_id, asset_type, strike, option_type, underlying_id, listed_date, expiry, multiplier):
+        """
+        Contract metadata as columnar arrays indexed by a dense integer contract id (cid).
+        The exchange, broker and strategy key contracts by cid; uni_id strings are only
+        used when reading data and when reporting results.
+        Futures have strike NaN and option_type ''; options carry their underlying future's uni_id.
+        """
+        self._uni_id = np.asarray(uni_id, dtype=str)
+        self._asset_type = np.asarray(asset_type, dtype=np.int8)
+        self._strike = np.asarray(strike, dtype=float)
+        self._option_type = np.asarray(option_type, dtype=str)
+        self._underlying_id = np.asarray(underlying_id, dtype=str)
+        self._listed_date = np.asarray(listed_date, dtype='datetime64[ns]')
+        self._expiry = np.asarray(expiry, dtype='datetime64[ns]')
+        self._multiplier = np.asarray(multiplier, dtype=np.int64)
+        self._index = pd.Index(self._uni_id)
+        self._cid = {uni_id: cid for cid, uni_id in enumerate(self._uni_id)}
+
+    def __len__(self):
+        return len(self._uni_id)
+
+    @property
+    def strike(self) -> np.ndarray:
+        return self._strike
+
+    @property
+    def option_type(self) -> np.ndarray:
+        return self._option_type
+
+    @property
+    def underlying_id(self) -> np.ndarray:
+        return self._underlying_id
+
+    @property
+    def listed_date(self) -> np.ndarray:
+        return self._listed_date
+
+    @property
+    def expiry(self) -> np.ndarray:
+        return self._expiry
+
+    @property
+    def multiplier(self) -> np.ndarray:
+        return self._multiplier
+
+    @property
+    def asset_type(self) -> np.ndarray:
+        return self._asset_type
+
+    def cid(self, uni_id: str) -> int:
+        return self._cid[uni_id]
+
+    def cids(self, uni_ids) -> np.ndarray:
+        # Vectorized interning; unknown contracts map to -1
+        return self._index.get_indexer(uni_ids)
+
+    def uni_id(self, cid: int) -> str:
+        return str(self._uni_id[cid])
+
+    def uni_ids(self, cids) -> np.ndarray:
+        return self._uni_id[np.asarray(cids, dtype=np.int64)]
+
+    @classmethod
+    def from_data(cls, options: pd.DataFrame, futures: pd.DataFrame):
+        """
+        Build the master from the cleaned options and futures data, one row per contract.
+        """
+        option_info = options.groupby('uni_id', sort=True).agg(
+            strike=('strike_price', 'first'), option_type=('option_type', 'first'),
+            underlying_id=('underlying_id', 'first'), listed_date=('listed_date', 'first'),
+            expiry=('de_listed_date', 'first'))
+        option_info['asset_type'] = AssetTypes.Option.value
+        option_info['multiplier'] = config_contract_multiplier
+
+        future_info = futures.groupby('uni_id', sort=True).agg(
+            listed_date=('listed_date', 'first'), expiry=('de_listed_date', 'first'))
+        future_info['strike'] = np.nan
+        future_info['option_type'] = ''
+        future_info['underlying_id'] = ''
+        future_info['asset_type'] = AssetTypes.Future.value
+        future_info['multiplier'] = [config_future_multiplier.get(uni_id[:2], 1) for uni_id in future_info.index]
+
+        info = pd.concat([option_info, future_info]).reset_index()
+        info = info[~info['uni_id'].duplicated()]
+        return cls(info['uni_id'], info['asset_type'], info['strike'], info['option_type'], info['underlying_id'],
+                   pd.to_datetime(info['listed_date']), pd.to_datetime(info['expiry']), info['multiplier'])
+
+    @staticmethod
+    def read_option_rows(path, chunksize=200_000) -> pd.DataFrame:
+        """
+        First row of each option in the file, read chunk by chunk with only the contract columns,
+        so the master can be built without loading the options.
+        """
+        usecols = ['uni_id', 'strike_price', 'option_type', 'underlying_id', 'listed_date', 'de_listed_date']
+        return pd.concat(chunk.drop_duplicates('uni_id')
+                         for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize))
+
+    def save(self, path, fingerprint=''):
+        np.savez(path, fingerprint=np.asarray(fingerprint), **{field: getattr(self, '_' + field)
+                                                               for field in self._fields})
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """
+        Load a saved master; returns None if the file is missing or was built from other data.
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as saved:
+            if fingerprint is not None and str(saved['fingerprint']) != fingerprint:
+                return None
+            return cls(*(saved[field] for field in cls._fields))
+
+    @staticmethod
+    def fingerprint(*paths) -> str:
+        return ';'.join(f"{os.path.basename(path)}:{os.path.getsize(path)}:{os.path.getmtime(path)}"
+                        for path in paths)
+
+    @staticmethod
+    def code_version() -> str:
+        # The master also depends on how it is built and on the multipliers in config
+        digest = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for module in ['ContractMaster', 'config']:
+            with open(os.path.join(base_dir, module + '.py'), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    @classmethod
+    def load_or_build(cls, market_data, cache_path='ContractMaster.npz'):
+        """
+        Load the cached master if it matches the data files and the code that builds it,
+        otherwise build it and refresh the cache.
+        When the options are streamed, they are scanned in chunks instead of being loaded.
+        """
+        fingerprint = cls.fingerprint(market_data.options_path, market_data.futures_path) + ';' + cls.code_version()
+        master = cls.load(cache_path, fingerprint)
+        if master is None:
+            options = cls.read_option_rows(market_data.options_path) if market_data.stream_options \
+                else market_data.options
+            master = cls.from_data(options, market_data.futures)
+            master.save(cache_path, fingerprint)
+        return master
@@ -0,0 +1,73 @@
+import pandas as pd
+
+required_cols = ['uni_id', 'date', 'exchange', 'type', 'listed_date', 'de_listed_date']
+date_cols = ['date', 'listed_date', 'de_listed_date']
+
+
+class DataValidationError(ValueError):
+    def __init__(self, report: pd.DataFrame):
+        """
+        Raised with every error found in a dataset; report has one row per violation.
+        """
+        self.report = report
+        errors = report[report['severity'] == 'error']
+        counts = ', '.join(f'{check}: {n}' for check, n in errors['check'].value_counts().items())
+        super().__init__(f"{len(errors)} data errors ({counts})\n{errors.head(20).to_string()}")
+
+
+def _violations(data, mask, check, detail, severity='error'):
+    rows = data[mask]
+    return pd.DataFrame({
+        'check': check,
+        'severity': severity,
+        'row': rows.index,
+        'uni_id': rows['uni_id'].to_numpy() if 'uni_id' in rows.columns else None,
+        'date': rows['date'].to_numpy() if 'date' in rows.columns else None,
+        'detail': detail,
+    })
+
+
+def validate_dataset(data: pd.DataFrame, exchange_symbol, asset_type, futures: pd.DataFrame = None):
+    """
+    Validate a cleaned dataset once, at load time, instead of on every trading day.
+    Every violation is collected with its row label; errors raise a DataValidationError carrying
+    the full report, warnings (options whose underlying future has no quote) are only reported.
+    Returns (data, report): a copy with the date columns converted and exact duplicate rows dropped,
+    marked with attrs['validated'] = (exchange_symbol, asset_type) so Base_Exchange.select_day can
+    skip its checks, and the report of warnings.
+    """
+    missing_cols = [col for col in required_cols if col not in data.columns]
+    if missing_cols:
+        raise DataValidationError(pd.DataFrame({
+            'check': 'missing_column', 'severity': 'error', 'row': None, 'uni_id': None, 'date': None,
+            'detail': missing_cols}))
+
+    data = data.drop_duplicates()
+    reports = [
+        _violations(data, data['type'] != asset_type, 'type_mismatch', f'type is not {asset_type}'),
+        _violations(data, data['exchange'] != exchange_symbol, 'exchange_mismatch',
+                    f'exchange is not {exchange_symbol}'),
+    ]
+
+    converted = {col: pd.to_datetime(data[col], errors='coerce') for col in date_cols}
+    for col in date_cols:
+        reports.append(_violations(data, converted[col].isna(), 'bad_date', f'{col} is missing or not a date'))
+    data = data.assign(**converted)
+
+    reports.append(_violations(data, data.duplicated(['date', 'uni_id'], keep=False), 'duplicate_id',
+                               'uni_id appears more than once on the date'))
+    reports.append(_violations(data, data['listed_date'] > data['de_listed_date'], 'listed_after_delisted',
+                               'listed_date is after de_listed_date'))
+
+    if futures is not None and 'underlying_id' in data.columns:
+        future_keys = pd.MultiIndex.from_arrays([pd.to_datetime(futures['date']), futures['uni_id']])
+        has_underlying = pd.MultiIndex.from_arrays([data['date'], data['underlying_id']]).isin(future_keys)
+        reports.append(_violations(data, ~has_underlying, 'missing_underlying',
+                                   'no future quote for underlying_id on the date', severity='warning'))
+
+    report = pd.concat(reports, ignore_index=True)
+    if (report['severity'] == 'error').any():
+        raise DataValidationError(report)
+
+    data.attrs['validated'] = (exchange_symbol, asset_type)
+    return data, report
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import pandas as pd
+from ContractMaster import ContractMaster
+
+
+class DateIndexedCSV:
+    def __init__(self, sorted_path, index_path):
+        """
+        A cleaned data CSV rewritten sorted by date, with a sidecar index of the byte offset
+        and row count of each date. A date window is read by seeking to its first row,
+        without parsing the rest of the file.
+        """
+        self._sorted_path = sorted_path
+        with open(index_path) as f:
+            index = json.load(f)
+        self._fingerprint = index['fingerprint']
+        self._columns = index['columns']
+        self._offsets = index['dates']
+        self._dates = sorted(self._offsets)
+
+    @property
+    def dates(self) -> list:
+        return self._dates
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    def read(self, dates) -> pd.DataFrame:
+        """
+        Rows of a run of consecutive dates of the index.
+        """
+        if not dates:
+            return pd.DataFrame(columns=self._columns[1:])
+        nrows = sum(self._offsets[date][1] for date in dates)
+        with open(self._sorted_path, 'rb') as f:
+            f.seek(self._offsets[dates[0]][0])
+            return pd.read_csv(f, header=None, names=self._columns, index_col=0, nrows=nrows)
+
+    @classmethod
+    def build(cls, csv_path, sorted_path, index_path, chunksize=200_000):
+        """
+        External sort by date with bounded memory: rows are spilled to one file per month in
+        chunks, then each month is sorted (stably) and appended to the sorted file.
+        """
+        with open(csv_path) as f:
+            header = f.readline().rstrip('\n')
+        columns = header.split(',')
+        parts_dir = sorted_path + '.parts'
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir)
+        try:
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize, index_col=0):
+                for month, part in chunk.groupby(chunk['date'].str[:7], sort=False):
+                    part.to_csv(os.path.join(parts_dir, month + '.csv'), mode='a', header=False)
+
+            offsets = {}
+            with open(sorted_path, 'wb') as out:
+                out.write((header + '\n').encode())
+                for part_file in sorted(os.listdir(parts_dir)):
+                    part = pd.read_csv(os.path.join(parts_dir, part_file), header=None, names=columns, index_col=0)
+                    part = part.sort_values(by='date', kind='stable')
+                    for date, rows in part.groupby('date', sort=True):
+                        offsets[date] = [out.tell(), len(rows)]
+                        out.write(rows.to_csv(header=False).encode())
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+        with open(index_path, 'w') as f:
+            json.dump({'fingerprint': ContractMaster.fingerprint(csv_path), 'columns': columns, 'dates': offsets}, f)
+        return cls(sorted_path, index_path)
+
+    @classmethod
+    def load_or_build(cls, csv_path):
+        stem = os.path.splitext(csv_path)[0]
+        sorted_path, index_path = stem + '.sorted.csv', stem + '.index.json'
+        if os.path.exists(sorted_path) and os.path.exists(index_path):
+            indexed = cls(sorted_path, index_path)
+            if indexed.fingerprint == ContractMaster.fingerprint(csv_path):
+                return indexed
+        return cls.build(csv_path, sorted_path, index_path)
+
+
+class DateRangeLoader:
+    def __init__(self, indexed_csv, start_date, end_date, chunk_days=20, prepare=None):
+        """
+        Streams the days of [start_date, end_date] from a DateIndexedCSV, chunk_days at a time.
+        Days are released once the iterator has moved past them, so peak memory depends on
+        chunk_days and not on the length of the history. Serves Exchange(daily_source=...).
+        prepare is applied to each chunk as it is read, e.g. MarketData.validate_options.
+        """
+        self._indexed_csv = indexed_csv
+        self._prepare = prepare
+        self._dates = [date for date in indexed_csv.dates if start_date <= date <= end_date]
+        self._chunk_days = chunk_days
+        self._next_pos = 0
+        self._days = {}
+
+    @property
+    def dates(self) -> list:
+        return self._dates
+
+    def _load_next_chunk(self):
+        chunk_dates = self._dates[self._next_pos:self._next_pos + self._chunk_days]
+        self._next_pos += len(chunk_dates)
+        chunk = self._indexed_csv.read(chunk_dates)
+        dates = chunk['date']
+        if self._prepare is not None:
+            chunk = self._prepare(chunk)
+            dates = pd.to_datetime(chunk['date']).dt.strftime('%Y-%m-%d')
+        self._days = dict(iter(chunk.groupby(dates, sort=False)))
+
+    def day(self, trading_date) -> pd.DataFrame:
+        if not isinstance(trading_date, str):
+            trading_date = pd.Timestamp(trading_date).strftime('%Y-%m-%d')
+        # Release the days before trading_date, then read ahead until it is loaded
+        self._days = {date: frame for date, frame in self._days.items() if date >= trading_date}
+        while trading_date not in self._days and self._next_pos < len(self._dates) \
+                and self._dates[self._next_pos] <= trading_date:
+            self._load_next_chunk()
+            self._days = {date: frame for date, frame in self._days.items() if date >= trading_date}
+        frame = self._days.pop(trading_date, None)
+        return frame if frame is not None else pd.DataFrame()
+
+    def __iter__(self):
+        for date in self._dates:
+            yield date, self.day(date)
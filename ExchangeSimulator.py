@@ -70,6 +70,26 @@ class Base_Exchange(ExchangeSimulator):
         self._curr_trading_time = None
         self._curr_info_df = None
         self._curr_price_df = None
+        self._live_feed = None
+        self._quote_handlers = []
+
+    def attach_feed(self, feed):
+        """
+        Attach a LiveFeed; request_data(method='live') then serves its latest-quote book,
+        and every quote is passed on to the handlers registered with subscribe_quotes.
+        """
+        self._live_feed = feed
+        feed.subscribe(self.on_quote)
+
+    def subscribe_quotes(self, handler):
+        """
+        Register handler(quote, book), called for each live quote without building a snapshot.
+        """
+        self._quote_handlers.append(handler)
+
+    def on_quote(self, quote: dict, book):
+        for handler in self._quote_handlers:
+            handler(quote, book)
 
     @property
     def curr_trading_time(self):
@@ -83,36 +103,53 @@ class Base_Exchange(ExchangeSimulator):
     def curr_price_df(self):
         return self._curr_price_df
 
-    def ingest(self, data: pd.DataFrame):
-        required_cols = ['uni_id', 'date', 'exchange', 'type', 'listed_date', 'de_listed_date']
-        missing_cols = [col for col in required_cols if col not in data.columns]
-        if missing_cols:
-            raise ValueError(f"Missing required columns: {missing_cols}")
-
-        if not (data['type'] == self.exchange_type.value).all():
-            raise ValueError("Data type mismatch")
-        if not (data['exchange'] == self.exchange_symbol).all():
-            raise ValueError("Exchange symbol mismatch")
-
-        data['date'] = pd.to_datetime(data['date'])
-        data['listed_date'] = pd.to_datetime(data['listed_date'])
-        data['de_listed_date'] = pd.to_datetime(data['de_listed_date'])
-
-        filtered_data = data.drop_duplicates()
-        filtered_data = filtered_data[(filtered_data['date'] == self.curr_trading_time)]
+    def select_day(self, data: pd.DataFrame, trading_time):
+        """
+        Validate the data and keep the contracts trading at trading_time.
+        Data already validated for this exchange (DataValidator.validate_dataset) skips the checks.
+        Returns (info_df, price_df), or None if nothing trades that day (including no data at all).
+        Does not change the exchange state.
+        """
+        if data.empty:
+            return None
+        validated = data.attrs.get('validated') == (self.exchange_symbol, self.exchange_type.value)
+        if validated:
+            filtered_data = data
+        else:
+            required_cols = ['uni_id', 'date', 'exchange', 'type', 'listed_date', 'de_listed_date']
+            missing_cols = [col for col in required_cols if col not in data.columns]
+            if missing_cols:
+                raise ValueError(f"Missing required columns: {missing_cols}")
+
+            if not (data['type'] == self.exchange_type.value).all():
+                raise ValueError("Data type mismatch")
+            if not (data['exchange'] == self.exchange_symbol).all():
+                raise ValueError("Exchange symbol mismatch")
+
+            data['date'] = pd.to_datetime(data['date'])
+            data['listed_date'] = pd.to_datetime(data['listed_date'])
+            data['de_listed_date'] = pd.to_datetime(data['de_listed_date'])
+
+            filtered_data = data.drop_duplicates()
+        filtered_data = filtered_data[(filtered_data['date'] == trading_time)]
         filtered_data = filtered_data[
-            (filtered_data['listed_date'] <= self.curr_trading_time) &
-            (filtered_data['de_listed_date'] > self.curr_trading_time)
+            (filtered_data['listed_date'] <= trading_time) &
+            (filtered_data['de_listed_date'] > trading_time)
             ]
 
-        if not filtered_data['uni_id'].is_unique:
+        if not validated and not filtered_data['uni_id'].is_unique:
             raise ValueError("Duplicate uni_id entries found")
 
-        if not filtered_data.empty:
-            self._curr_info_df = filtered_data[
-                ['uni_id', 'exchange', 'type', 'listed_date', 'de_listed_date']].set_index('uni_id')
-            self._curr_price_df = filtered_data.drop(
-                columns=['date', 'exchange', 'type']).set_index('uni_id')
+        if filtered_data.empty:
+            return None
+        info_df = filtered_data[['uni_id', 'exchange', 'type', 'listed_date', 'de_listed_date']].set_index('uni_id')
+        price_df = filtered_data.drop(columns=['date', 'exchange', 'type']).set_index('uni_id')
+        return info_df, price_df
+
+    def ingest(self, data: pd.DataFrame):
+        day = self.select_day(data, self.curr_trading_time)
+        if day is not None:
+            self._curr_info_df, self._curr_price_df = day
             self._backtest_activate_info = True
             self._backtest_activate_data = True
 
@@ -120,7 +157,9 @@ class Base_Exchange(ExchangeSimulator):
         if method == 'hist':
             return pd.DataFrame()
         elif method == 'live':
-            return pd.DataFrame()
+            if self._live_feed is None:
+                return pd.DataFrame()
+            return self._live_feed.book.snapshot()
         return pd.DataFrame()
 
     def __next__(self):
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+class FuturesStore:
+    def __init__(self, futures: pd.DataFrame):
+        """
+        Dense (date x contract) matrix of futures closes with O(1) lookups, plus the
+        continuous front-month / next-month series and their roll schedules.
+        Dates are keyed as 'YYYY-MM-DD' strings like the cleaned data.
+        """
+        closes = futures.pivot_table(index='date', columns='uni_id', values='close', aggfunc='last')
+        closes = closes.sort_index().sort_index(axis=1)
+        self._dates = closes.index
+        self._ids = closes.columns
+        self._date_pos = {date: i for i, date in enumerate(self._dates)}
+        self._id_pos = {uni_id: j for j, uni_id in enumerate(self._ids)}
+        self._close = closes.to_numpy(dtype=float)
+        self._continuous = {}
+
+    @staticmethod
+    def _date_key(date):
+        return date if isinstance(date, str) else pd.Timestamp(date).strftime('%Y-%m-%d')
+
+    @property
+    def dates(self) -> pd.Index:
+        return self._dates
+
+    @property
+    def ids(self) -> pd.Index:
+        return self._ids
+
+    def close(self, date, uni_id) -> float:
+        i = self._date_pos.get(self._date_key(date))
+        j = self._id_pos.get(uni_id)
+        if i is None or j is None:
+            return np.nan
+        return self._close[i, j]
+
+    def closes(self, date, uni_ids) -> pd.Series:
+        """
+        Closes of the given contracts on the date as a 'close_underlying' Series; missing contracts are dropped.
+        """
+        i = self._date_pos.get(self._date_key(date))
+        uni_ids = [uni_id for uni_id in uni_ids if uni_id in self._id_pos]
+        if i is None or not uni_ids:
+            return pd.Series(dtype=float, name='close_underlying')
+        values = self._close[i, [self._id_pos[uni_id] for uni_id in uni_ids]]
+        closes = pd.Series(values, index=pd.Index(uni_ids, name='uni_id'), name='close_underlying')
+        return closes.dropna()
+
+    def continuous(self, product, rank=0) -> pd.DataFrame:
+        """
+        Continuous series of the product's rank-th listed contract (0 = front month, 1 = next month)
+        on each date, with columns date, uni_id, close. Contract codes sort by delivery month.
+        """
+        key = (product, rank)
+        if key not in self._continuous:
+            cols = np.flatnonzero(self._ids.str.startswith(product))
+            quoted = ~np.isnan(self._close[:, cols])
+            hit = quoted & (np.cumsum(quoted, axis=1) == rank + 1)
+            rows = np.flatnonzero(hit.any(axis=1))
+            picked = cols[hit[rows].argmax(axis=1)]
+            self._continuous[key] = pd.DataFrame({
+                'date': self._dates[rows],
+                'uni_id': self._ids[picked],
+                'close': self._close[rows, picked],
+            })
+        return self._continuous[key]
+
+    def roll_schedule(self, product, rank=0) -> pd.DataFrame:
+        """
+        Dates on which the continuous series switches contract, with the contracts rolled from and to.
+        """
+        series = self.continuous(product, rank)
+        rolled = series['uni_id'] != series['uni_id'].shift()
+        rolled.iloc[0] = False
+        return pd.DataFrame({
+            'date': series['date'][rolled],
+            'from_id': series['uni_id'].shift()[rolled],
+            'to_id': series['uni_id'][rolled],
+        }).reset_index(drop=True)
@@ -0,0 +1,135 @@
+import pandas as pd
+from ExchangeSimulator import Base_Exchange
+
+
+class BarStream:
+    def __init__(self, path, start_date, end_date, chunksize=200_000, timestamp_col='timestamp', index_col=None):
+        """
+        Streams intraday bars from a CSV sorted by timestamp.
+        The file is memory-mapped and read in chunks, so memory is bounded by the chunk size
+        (plus the rows of one bar) whatever the length of the history.
+        Yields (bar_time, bars) where bars holds every contract's row for that timestamp.
+        """
+        self._path = path
+        self._start_date = pd.Timestamp(start_date)
+        self._end_date = pd.Timestamp(end_date)
+        self._chunksize = chunksize
+        self._timestamp_col = timestamp_col
+        self._index_col = index_col
+
+    def __iter__(self):
+        ts_col = self._timestamp_col
+        pending = None  # Rows of the last timestamp of a chunk, which may continue in the next chunk
+        last_ts = None
+        reader = pd.read_csv(self._path, chunksize=self._chunksize, memory_map=True, index_col=self._index_col,
+                             parse_dates=[ts_col])
+        with reader:
+            for chunk in reader:
+                if chunk.empty:
+                    continue
+                timestamps = chunk[ts_col]
+                if not timestamps.is_monotonic_increasing or (last_ts is not None and timestamps.iloc[0] < last_ts):
+                    raise ValueError("Bar data must be sorted by timestamp")
+                last_ts = timestamps.iloc[-1]
+
+                dates = timestamps.dt.normalize()
+                if dates.iloc[0] > self._end_date:
+                    break
+                chunk = chunk[(dates >= self._start_date) & (dates <= self._end_date)]
+                if pending is not None:
+                    chunk = pd.concat([pending, chunk])
+                if chunk.empty:
+                    continue
+
+                tail = chunk[ts_col] == chunk[ts_col].iloc[-1]
+                pending = chunk[tail]
+                for bar_time, bars in chunk[~tail].groupby(ts_col, sort=False):
+                    yield bar_time, bars
+
+        if pending is not None and not pending.empty:
+            yield pending[ts_col].iloc[0], pending
+
+
+class IntradayExchange(Base_Exchange):
+    def __init__(self, exchange_symbol, trading_calender, exchange_type, start_date, end_date, bar_stream):
+        """
+        Steps through (date, bar) pairs instead of whole trading days.
+        Bars on dates outside the trading calendar are skipped.
+        """
+        super().__init__(exchange_symbol, trading_calender, exchange_type, start_date, end_date)
+        self._bar_stream = bar_stream
+        self._bar_iter = None
+        self._curr_bar_time = None
+        self._trading_days = set(pd.to_datetime(self.trading_calender))
+
+    @property
+    def curr_bar_time(self):
+        return self._curr_bar_time
+
+    def ingest(self, data: pd.DataFrame):
+        self._curr_price_df = data.drop(columns=['exchange', 'type'], errors='ignore').set_index('uni_id')
+        self._curr_info_df = data[['uni_id', 'exchange', 'type', 'listed_date', 'de_listed_date']].set_index('uni_id')
+        self._backtest_activate_info = True
+        self._backtest_activate_data = True
+
+    def request_data(self, method='hist'):
+        if self._bar_iter is None:
+            self._bar_iter = iter(self._bar_stream)
+        for bar_time, bars in self._bar_iter:
+            if bar_time.normalize() in self._trading_days:
+                return bar_time, bars
+        raise StopIteration
+
+    def __next__(self):
+        bar_time, bars = self.request_data()
+        trading_date = bar_time.normalize()
+        if trading_date != self._curr_trading_time:
+            self.current_idx += 1
+        self._curr_trading_time = trading_date
+        self._curr_bar_time = bar_time
+        self.ingest(bars)
+        return self.curr_trading_time, self.curr_bar_time, self.curr_price_df
+
+
+class DailyBarAdapter:
+    def __init__(self, bar_stream, timestamp_col='timestamp'):
+        """
+        Aggregates a bar stream into daily frames in the layout of the cleaned daily data,
+        so daily strategies can run on intraday sources through Exchange(daily_source=...).
+        Only the bars of the requested day are held in memory.
+        """
+        self._bar_iter = iter(bar_stream)
+        self._timestamp_col = timestamp_col
+        self._peeked = None
+
+    def _next_bar(self):
+        if self._peeked is not None:
+            bar, self._peeked = self._peeked, None
+            return bar
+        return next(self._bar_iter, None)
+
+    def day(self, trading_date) -> pd.DataFrame:
+        trading_date = pd.Timestamp(trading_date)
+        day_bars = []
+        while True:
+            bar = self._next_bar()
+            if bar is None:
+                break
+            bar_date = bar[0].normalize()
+            if bar_date > trading_date:
+                self._peeked = bar
+                break
+            if bar_date == trading_date:
+                day_bars.append(bar[1])
+
+        if not day_bars:
+            return pd.DataFrame()
+        return self.aggregate(pd.concat(day_bars), trading_date)
+
+    def aggregate(self, bars: pd.DataFrame, trading_date) -> pd.DataFrame:
+        agg = {col: 'first' for col in bars.columns if col not in ('uni_id', self._timestamp_col)}
+        agg.update({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+        daily = bars.sort_values(self._timestamp_col, kind='stable').groupby('uni_id', sort=False).agg(agg)
+        daily['close_adj'] = daily['close']  # No settlement price intraday
+        daily['date'] = trading_date
+        return daily.reset_index()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+import numpy as np
+import pandas as pd
+
+
+class QuoteBook:
+    def __init__(self):
+        """
+        Latest quote per contract, updated one quote at a time.
+        The DataFrame snapshot is kept between calls: only the contracts quoted since the
+        last snapshot are written into it, so a snapshot costs O(updates), not O(book).
+        """
+        self._quotes = {}
+        self._pending = {}  # Quotes not yet written into the snapshot
+        self._snapshot = None
+
+    def __len__(self):
+        return len(self._quotes)
+
+    def __contains__(self, uni_id):
+        return uni_id in self._quotes
+
+    def get(self, uni_id):
+        return self._quotes.get(uni_id)
+
+    def update(self, quote: dict):
+        self._quotes[quote['uni_id']] = quote
+        self._pending[quote['uni_id']] = quote
+
+    def snapshot(self) -> pd.DataFrame:
+        """
+        Latest quotes, one row per contract indexed by uni_id (also kept as a column).
+        """
+        if self._pending:
+            changed = pd.DataFrame(list(self._pending.values()))
+            changed.index = changed['uni_id'].to_numpy()
+            self._pending = {}
+            if self._snapshot is None:
+                self._snapshot = changed
+            else:
+                known = changed.index.isin(self._snapshot.index)
+                self._snapshot.loc[changed.index[known], changed.columns] = changed[known]
+                if not known.all():
+                    self._snapshot = pd.concat([self._snapshot, changed[~known]])
+        return self._snapshot if self._snapshot is not None else pd.DataFrame()
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self._samples = []
+
+    def record(self, latency_ns: int):
+        self._samples.append(latency_ns)
+
+    def summary(self) -> dict:
+        """
+        Latency percentiles in microseconds.
+        """
+        if not self._samples:
+            return {}
+        samples = np.array(self._samples) / 1e3
+        return {
+            'count': len(samples),
+            'p50_us': float(np.percentile(samples, 50)),
+            'p90_us': float(np.percentile(samples, 90)),
+            'p99_us': float(np.percentile(samples, 99)),
+            'max_us': float(samples.max()),
+        }
+
+
+class LiveFeed:
+    def __init__(self):
+        """
+        Asyncio client for a newline-delimited JSON quote feed.
+        Every quote updates the QuoteBook, then the subscribers are called with (quote, book).
+        Tick-to-decision latency is measured from the receipt of the line to the return of the
+        last subscriber; wire latency uses the server's 'sent_ns' stamp when present.
+        """
+        self._book = QuoteBook()
+        self._subscribers = []
+        self._reader = None
+        self._writer = None
+        self.decision_latency = LatencyRecorder()
+        self.wire_latency = LatencyRecorder()
+
+    @property
+    def book(self) -> QuoteBook:
+        return self._book
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    async def connect(self, host, port):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+
+    async def run(self):
+        """
+        Consumes the feed until the server sends an 'end' event or closes the connection.
+        """
+        try:
+            async for line in self._reader:
+                recv_ns = time.time_ns()
+                quote = json.loads(line)
+                if quote.get('event') == 'end':
+                    break
+                sent_ns = quote.pop('sent_ns', None)
+                if sent_ns is not None:
+                    self.wire_latency.record(recv_ns - sent_ns)
+
+                self._book.update(quote)
+                for callback in self._subscribers:
+                    callback(quote, self._book)
+                self.decision_latency.record(time.time_ns() - recv_ns)
+        finally:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+class ReplayServer:
+    def __init__(self, path='CleanedData_options.csv', start_date=None, end_date=None, interval=0.0):
+        """
+        Local server replaying the cleaned historical data as a quote feed, in date order.
+        interval is the pause in seconds between trading days.
+        """
+        data = pd.read_csv(path, index_col=0)
+        if start_date is not None:
+            data = data[data['date'] >= start_date]
+        if end_date is not None:
+            data = data[data['date'] <= end_date]
+        self._data = data.sort_values('date', kind='stable')
+        self._interval = interval
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            for _, day in self._data.groupby('date', sort=False):
+                for quote in day.to_dict('records'):
+                    quote['sent_ns'] = time.time_ns()
+                    writer.write(json.dumps(quote, default=str).encode() + b'\n')
+                await writer.drain()
+                await asyncio.sleep(self._interval)
+            writer.write(json.dumps({'event': 'end'}).encode() + b'\n')
+            await writer.drain()
+        except ConnectionResetError:
+            pass
+        finally:
+            writer.close()
+
+
+async def replay_session(on_quote, path='CleanedData_options.csv', start_date=None, end_date=None, interval=0.0):
+    """
+    Streams the historical data through a local ReplayServer into a LiveFeed and returns the feed,
+    whose decision_latency/wire_latency hold the measured latencies.
+    """
+    server = ReplayServer(path, start_date, end_date, interval)
+    await server.start()
+    feed = LiveFeed()
+    feed.subscribe(on_quote)
+    try:
+        await feed.connect('127.0.0.1', server.port)
+        await feed.run()
+    finally:
+        await server.close()
+    return feed
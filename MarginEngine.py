@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+from config import config_contract_multiplier, config_margin_ratio, config_min_margin_coef
+
+
+def short_option_margin(settle, underlying, strike, is_call, multiplier=config_contract_multiplier,
+                        margin_ratio=config_margin_ratio, min_margin_coef=config_min_margin_coef):
+    """
+    CFFEX short index option margin per lot, vectorized over numpy arrays:
+    settle * multiplier + max(underlying * multiplier * margin_ratio - out_of_the_money_amount,
+                              min_margin_coef * (underlying if call else strike) * multiplier * margin_ratio)
+    """
+    settle = np.asarray(settle, dtype=float)
+    underlying = np.asarray(underlying, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    otm_amount = np.where(is_call, np.maximum(strike - underlying, 0), np.maximum(underlying - strike, 0)) * multiplier
+    base = underlying * multiplier * margin_ratio
+    # 最低保障: on the underlying price for calls, on the strike for puts
+    floor = min_margin_coef * np.where(is_call, underlying, strike) * multiplier * margin_ratio
+    return settle * multiplier + np.maximum(base - otm_amount, floor)
+
+
+class MarginEngine:
+    def __init__(self, contracts, margin_ratio=config_margin_ratio, min_margin_coef=config_min_margin_coef):
+        """
+        Keeps the open legs as arrays so the daily margin is one vectorized pass.
+        The leg arrays are only rebuilt when the positions change; on price-only days
+        the prices are re-read with a single reindex.
+        """
+        self._contracts = contracts  # ContractMaster, positions are keyed by cid
+        self._margin_ratio = margin_ratio
+        self._min_margin_coef = min_margin_coef
+        self._signature = None
+        self._ids = pd.Index([], dtype=np.int64)
+        self._short_lots = np.empty(0)
+        self._strikes = np.empty(0)
+        self._is_call = np.empty(0, dtype=bool)
+        self._multipliers = np.empty(0)
+        # Last known prices, used when a leg has no quote today
+        self._settle = np.empty(0)
+        self._underlying = np.empty(0)
+        self._leg_margin = pd.Series(dtype=float)
+
+    @property
+    def leg_margin(self) -> pd.Series:
+        return self._leg_margin
+
+    def sync_positions(self, positions: dict) -> bool:
+        signature = tuple((option_id, position['shares']) for option_id, position in positions.items())
+        if signature == self._signature:
+            return False
+
+        ids = pd.Index(list(positions.keys()), dtype=np.int64)
+        shares = np.array([position['shares'] for position in positions.values()], dtype=float)
+
+        # Carry over the last known prices of legs that are still open
+        prev = pd.DataFrame({'settle': self._settle, 'underlying': self._underlying}, index=self._ids).reindex(ids)
+
+        self._signature = signature
+        self._ids = ids
+        self._short_lots = np.maximum(-shares, 0)
+        self._strikes = self._contracts.strike[ids]
+        self._is_call = self._contracts.option_type[ids] == 'C'
+        self._multipliers = self._contracts.multiplier[ids].astype(float)
+        self._settle = prev['settle'].to_numpy(dtype=float)
+        self._underlying = prev['underlying'].to_numpy(dtype=float)
+        return True
+
+    def update(self, price_df: pd.DataFrame) -> float:
+        if len(self._ids) == 0:
+            self._leg_margin = pd.Series(dtype=float)
+            return 0.0
+
+        rows = price_df.reindex(self._ids)
+        settle_col = 'close_adj' if 'close_adj' in rows.columns else 'close'
+        settle = rows[settle_col].to_numpy(dtype=float)
+        underlying = rows['close_underlying'].to_numpy(dtype=float)
+        self._settle = np.where(np.isnan(settle), self._settle, settle)
+        self._underlying = np.where(np.isnan(underlying), self._underlying, underlying)
+
+        per_lot = short_option_margin(self._settle, self._underlying, self._strikes, self._is_call,
+                                      self._multipliers, self._margin_ratio, self._min_margin_coef)
+        leg_margin = np.nan_to_num(per_lot) * self._short_lots
+        self._leg_margin = pd.Series(leg_margin, index=self._ids)
+        return float(leg_margin.sum())
+
+    def get_state(self) -> dict:
+        return {
+            'signature': self._signature,
+            'ids': self._ids,
+            'short_lots': self._short_lots,
+            'strikes': self._strikes,
+            'is_call': self._is_call,
+            'multipliers': self._multipliers,
+            'settle': self._settle,
+            'underlying': self._underlying,
+        }
+
+    def set_state(self, state: dict):
+        self._signature = state['signature']
+        self._ids = state['ids']
+        self._short_lots = state['short_lots']
+        self._strikes = state['strikes']
+        self._is_call = state['is_call']
+        self._multipliers = state['multipliers']
+        self._settle = state['settle']
+        self._underlying = state['underlying']
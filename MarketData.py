@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from config import config_exchange_symbol
+from ContractMaster import ContractMaster
+from DataValidator import validate_dataset
+from DateRangeLoader import DateIndexedCSV, DateRangeLoader
+from FuturesStore import FuturesStore
+from enums import AssetTypes
+
+
+class MarketData:
+    def __init__(self, options_path='CleanedData_options.csv', futures_path='CleanedData_futures.csv',
+                 stream_options=False, chunk_days=20):
+        """
+        Loads each cleaned dataset once, on first use, and is shared by the Exchange,
+        the Strategy and the plotting code.
+        With stream_options, the options are never loaded whole: each backtest streams its
+        date window from a date-sorted, indexed copy of the options file.
+        """
+        self._options_path = options_path
+        self._futures_path = futures_path
+        self._stream_options = stream_options
+        self._chunk_days = chunk_days
+        self._options = None
+        self._options_index = None
+        self._validation_report = None
+        self._reported_dates = set()  # Streamed dates whose warnings are already counted
+        self._futures = None
+        self._futures_by_date_id = None
+        self._futures_store = None
+        self._contract_master = None
+        self._trading_calender = None
+
+    @property
+    def options_path(self):
+        return self._options_path
+
+    @property
+    def futures_path(self):
+        return self._futures_path
+
+    @property
+    def stream_options(self) -> bool:
+        return self._stream_options
+
+    @property
+    def options(self) -> pd.DataFrame:
+        if self._options is None:
+            options = self.validate_options(pd.read_csv(self._options_path, index_col=0))
+            # Set before interning: building the contract master may read the options
+            self._options = options
+            options['cid'] = self.contract_master.cids(options['uni_id'])
+        return self._options
+
+    def validate_options(self, options: pd.DataFrame) -> pd.DataFrame:
+        """
+        Validate options once when they are loaded (whole or by chunk) and convert their dates;
+        the exchange then skips its per-day checks. Warnings are kept in validation_report:
+        row by row for loaded options, as counts per date and check for streamed ones.
+        """
+        options, report = validate_dataset(options, config_exchange_symbol, AssetTypes.Option.value, self.futures)
+        if not self._stream_options:
+            self._validation_report = report
+            return options
+
+        # Each date is counted once, however many runs stream it
+        report_dates = pd.to_datetime(report['date'])
+        counts = report[~report_dates.isin(self._reported_dates)] \
+            .groupby([report_dates, 'check', 'severity']).size().rename('count').reset_index()
+        self._reported_dates.update(options['date'].unique())
+        self._validation_report = counts if self._validation_report is None else \
+            pd.concat([self._validation_report, counts], ignore_index=True)
+        return options
+
+    @property
+    def validation_report(self) -> pd.DataFrame:
+        return self._validation_report
+
+    @property
+    def options_index(self) -> DateIndexedCSV:
+        # Built once (bounded memory) and reused until the options file changes
+        if self._options_index is None:
+            self._options_index = DateIndexedCSV.load_or_build(self._options_path)
+        return self._options_index
+
+    def options_window(self, start_date, end_date) -> DateRangeLoader:
+        """
+        Per-day options of [start_date, end_date], read chunk by chunk. Serves Exchange(daily_source=...).
+        """
+        return DateRangeLoader(self.options_index, start_date, end_date, self._chunk_days,
+                               prepare=self.validate_options)
+
+    @property
+    def futures(self) -> pd.DataFrame:
+        if self._futures is None:
+            self._futures = pd.read_csv(self._futures_path, index_col=0)
+        return self._futures
+
+    @property
+    def futures_by_date_id(self) -> pd.DataFrame:
+        # Futures indexed by (date, uni_id), as used to join the underlying prices
+        if self._futures_by_date_id is None:
+            self._futures_by_date_id = self.futures.set_index(['date', 'uni_id'])
+        return self._futures_by_date_id
+
+    @property
+    def contract_master(self) -> ContractMaster:
+        if self._contract_master is None:
+            self._contract_master = ContractMaster.load_or_build(self)
+        return self._contract_master
+
+    @property
+    def futures_store(self) -> FuturesStore:
+        # Dense close matrix and continuous series, shared by the exchange join and the benchmark
+        if self._futures_store is None:
+            self._futures_store = FuturesStore(self.futures)
+        return self._futures_store
+
+    @property
+    def trading_calender(self):
+        if self._trading_calender is None:
+            if self._stream_options:
+                # The index lists the dates without reading the options
+                trading_calender = np.array(self.options_index.dates, dtype=object)
+            else:
+                # Dates are kept as strings on the calendar, as in the results
+                trading_calender = pd.DatetimeIndex(self.options['date'].unique()).sort_values() \
+                    .strftime('%Y-%m-%d').to_numpy(dtype=object)
+            self._trading_calender = trading_calender
+        return self._trading_calender
+
+    def load(self):
+        """
+        Load everything up front, e.g. before forking worker processes.
+        """
+        self.trading_calender
+        self.contract_master
+        self.futures_by_date_id
+        self.futures_store
+        return self
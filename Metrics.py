@@ -0,0 +1,121 @@
+import math
+from collections import deque
+
+
+class MetricsAccumulator:
+    def __init__(self, window=20, periods_per_year=252):
+        """
+        Constant-memory performance metrics fed with one daily return at a time:
+        compounded equity, running max drawdown, Welford mean/variance for Sharpe,
+        downside deviation for Sortino, turnover and rolling-window mean/volatility.
+        """
+        self._window = window
+        self._periods_per_year = periods_per_year
+        self._count = 0
+        self._equity = 1.0
+        self._peak = 1.0
+        self._drawdown = 0.0
+        self._max_drawdown = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._downside_sq = 0.0
+        self._turnover = 0.0
+        self._rolling = deque(maxlen=window)
+        self._rolling_sum = 0.0
+        self._rolling_sum_sq = 0.0
+
+    def update(self, daily_return, turnover=0.0):
+        self._count += 1
+        self._equity *= 1 + daily_return
+        self._peak = max(self._peak, self._equity)
+        self._drawdown = self._equity / self._peak - 1 if self._peak else 0.0
+        self._max_drawdown = min(self._max_drawdown, self._drawdown)
+
+        # Welford update of the mean and the sum of squared deviations
+        delta = daily_return - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (daily_return - self._mean)
+        self._downside_sq += min(daily_return, 0.0) ** 2
+        self._turnover += float(turnover)
+
+        if len(self._rolling) == self._window:
+            dropped = self._rolling[0]
+            self._rolling_sum -= dropped
+            self._rolling_sum_sq -= dropped * dropped
+        self._rolling.append(daily_return)
+        self._rolling_sum += daily_return
+        self._rolling_sum_sq += daily_return * daily_return
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def equity(self):
+        return self._equity
+
+    @property
+    def cumulative_return(self):
+        return self._equity - 1
+
+    @property
+    def drawdown(self):
+        return self._drawdown
+
+    @property
+    def max_drawdown(self):
+        return self._max_drawdown
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def volatility(self):
+        return math.sqrt(self._m2 / (self._count - 1)) if self._count > 1 else 0.0
+
+    @property
+    def sharpe(self):
+        volatility = self.volatility
+        return self._mean / volatility * math.sqrt(self._periods_per_year) if volatility else 0.0
+
+    @property
+    def sortino(self):
+        downside = math.sqrt(self._downside_sq / self._count) if self._count else 0.0
+        return self._mean / downside * math.sqrt(self._periods_per_year) if downside else 0.0
+
+    @property
+    def turnover(self):
+        return self._turnover
+
+    @property
+    def rolling_mean(self):
+        return self._rolling_sum / len(self._rolling) if self._rolling else 0.0
+
+    @property
+    def rolling_volatility(self):
+        n = len(self._rolling)
+        if n < 2:
+            return 0.0
+        variance = (self._rolling_sum_sq - self._rolling_sum * self._rolling_sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def rolling_sharpe(self):
+        volatility = self.rolling_volatility
+        return self.rolling_mean / volatility * math.sqrt(self._periods_per_year) if volatility else 0.0
+
+    def summary(self) -> dict:
+        return {
+            'days': self.count,
+            'cumulative_return': self.cumulative_return,
+            'max_drawdown': self.max_drawdown,
+            'mean_return': self.mean,
+            'volatility': self.volatility,
+            'sharpe': self.sharpe,
+            'sortino': self.sortino,
+            'turnover': self.turnover,
+            'rolling_mean': self.rolling_mean,
+            'rolling_volatility': self.rolling_volatility,
+            'rolling_sharpe': self.rolling_sharpe,
+        }
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from OptionPricing import black76_delta, black76_implied_vol
+
+
+class OptionChain:
+    def __init__(self, contracts: pd.DataFrame, trading_date):
+        """
+        Per-day option chain built by the exchange from the contracts joined with their underlying.
+        Strikes are kept sorted per (underlying, option type); an underlying is one expiry and
+        expiries are ranked by delisting date (0 = front month). Queries are answered by bisection.
+        """
+        self._trading_date = pd.Timestamp(trading_date)
+        contracts = contracts.sort_values(by=['underlying_id', 'option_type', 'strike_price'])
+        self._ids = {}
+        self._strikes = {}
+        self._closes = {}
+        self._deltas = {}
+        for key, idx in contracts.groupby(['underlying_id', 'option_type'], sort=False).indices.items():
+            self._ids[key] = contracts.index.to_numpy()[idx]
+            self._strikes[key] = contracts['strike_price'].to_numpy(dtype=float)[idx]
+            self._closes[key] = contracts['close'].to_numpy(dtype=float)[idx]
+
+        expiry_info = contracts.groupby('underlying_id').agg(forward=('close_underlying', 'first'),
+                                                             expiry=('de_listed_date', 'min'))
+        expiry_info = expiry_info.sort_values(by='expiry', kind='stable')
+        self._expiries = list(expiry_info.index)
+        self._forward = expiry_info['forward'].to_dict()
+        self._tau = ((pd.to_datetime(expiry_info['expiry']) - self._trading_date).dt.days / 365).to_dict()
+
+    @property
+    def trading_date(self):
+        return self._trading_date
+
+    @property
+    def expiries(self) -> list:
+        return self._expiries
+
+    def expiry(self, expiry_rank=0):
+        return self._expiries[expiry_rank] if 0 <= expiry_rank < len(self._expiries) else None
+
+    def forward(self, expiry_rank=0):
+        return self._forward.get(self.expiry(expiry_rank))
+
+    def _bucket(self, option_type, expiry_rank):
+        key = (self.expiry(expiry_rank), option_type)
+        return key if key in self._strikes else None
+
+    def below_atm(self, k=0, option_type='P', expiry_rank=0):
+        """
+        k-th strike strictly below the underlying price (k=0 is the nearest), or None.
+        """
+        key = self._bucket(option_type, expiry_rank)
+        if key is None:
+            return None
+        i = np.searchsorted(self._strikes[key], self._forward[key[0]], side='left') - 1 - k
+        return self._ids[key][i] if 0 <= i else None
+
+    def above_atm(self, k=0, option_type='P', expiry_rank=0):
+        """
+        k-th strike strictly above the underlying price (k=0 is the nearest), or None.
+        """
+        key = self._bucket(option_type, expiry_rank)
+        if key is None:
+            return None
+        i = np.searchsorted(self._strikes[key], self._forward[key[0]], side='right') + k
+        return self._ids[key][i] if i < len(self._ids[key]) else None
+
+    def otm(self, k=0, option_type='P', expiry_rank=0):
+        if option_type == 'P':
+            return self.below_atm(k, option_type, expiry_rank)
+        return self.above_atm(k, option_type, expiry_rank)
+
+    def itm(self, k=0, option_type='P', expiry_rank=0):
+        if option_type == 'P':
+            return self.above_atm(k, option_type, expiry_rank)
+        return self.below_atm(k, option_type, expiry_rank)
+
+    def nearest_strike(self, strike, option_type='P', expiry_rank=0):
+        key = self._bucket(option_type, expiry_rank)
+        if key is None:
+            return None
+        strikes = self._strikes[key]
+        i = np.searchsorted(strikes, strike)
+        if i == len(strikes) or (i > 0 and strike - strikes[i - 1] <= strikes[i] - strike):
+            i -= 1
+        return self._ids[key][i]
+
+    def _bucket_deltas(self, key):
+        # Deltas fall with the strike; stored negated and made monotonic for searchsorted
+        if key not in self._deltas:
+            forward, tau = self._forward[key[0]], self._tau[key[0]]
+            is_call = key[1] == 'C'
+            sigma = black76_implied_vol(self._closes[key], forward, self._strikes[key], tau, is_call)
+            delta = black76_delta(forward, self._strikes[key], tau, sigma, is_call)
+            # Quotes without an implied vol get the intrinsic delta
+            intrinsic = np.where(self._strikes[key] < forward, 1.0, 0.0) - (0.0 if is_call else 1.0)
+            delta = np.where(np.isnan(delta), intrinsic, delta)
+            self._deltas[key] = np.maximum.accumulate(-delta)
+        return self._deltas[key]
+
+    def nearest_delta(self, delta, option_type='P', expiry_rank=0):
+        """
+        Contract whose Black-76 delta (from its implied vol) is nearest to `delta`, e.g. -0.25 for puts.
+        """
+        key = self._bucket(option_type, expiry_rank)
+        if key is None:
+            return None
+        neg_deltas = self._bucket_deltas(key)
+        i = np.searchsorted(neg_deltas, -delta)
+        if i == len(neg_deltas) or (i > 0 and -delta - neg_deltas[i - 1] <= neg_deltas[i] + delta):
+            i -= 1
+        return self._ids[key][i]
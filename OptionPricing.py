@@ -0,0 +1,69 @@
+import numpy as np
+
+
+def norm_cdf(x):
+    """
+    Standard normal CDF for numpy arrays (Abramowitz & Stegun 26.2.17, abs error < 7.5e-8).
+    """
+    x = np.asarray(x, dtype=float)
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    tail = np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi) * poly
+    return np.where(x >= 0, 1.0 - tail, tail)
+
+
+def norm_pdf(x):
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def _d1_d2(forward, strike, tau, sigma):
+    vol_sqrt_t = sigma * np.sqrt(tau)
+    d1 = (np.log(forward / strike) + 0.5 * vol_sqrt_t * vol_sqrt_t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def black76_price(forward, strike, tau, sigma, is_call, discount=1.0):
+    """
+    Black-76 price of an option on a future. All arguments broadcast against each other.
+    """
+    forward, strike, tau, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float)
+                                                        for a in (forward, strike, tau, sigma)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = _d1_d2(forward, strike, tau, sigma)
+        call = forward * norm_cdf(d1) - strike * norm_cdf(d2)
+        put = strike * norm_cdf(-d2) - forward * norm_cdf(-d1)
+    price = np.where(is_call, call, put)
+    # At expiry (or zero vol) the option is worth its intrinsic value
+    intrinsic = np.where(is_call, np.maximum(forward - strike, 0), np.maximum(strike - forward, 0))
+    price = np.where((tau > 0) & (sigma > 0), price, intrinsic)
+    return discount * price
+
+
+def black76_delta(forward, strike, tau, sigma, is_call):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, _ = _d1_d2(np.asarray(forward, dtype=float), np.asarray(strike, dtype=float),
+                       np.asarray(tau, dtype=float), np.asarray(sigma, dtype=float))
+    return np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0)
+
+
+def black76_implied_vol(price, forward, strike, tau, is_call, low=1e-4, high=5.0, n_iter=60):
+    """
+    Vectorized bisection for the Black-76 implied volatility.
+    Quotes outside the no-arbitrage bounds return NaN.
+    """
+    price, forward, strike, tau = np.broadcast_arrays(*(np.asarray(a, dtype=float)
+                                                        for a in (price, forward, strike, tau)))
+    is_call = np.broadcast_to(is_call, price.shape)
+    lo = np.full(price.shape, low)
+    hi = np.full(price.shape, high)
+    for _ in range(n_iter):
+        mid = 0.5 * (lo + hi)
+        too_high = black76_price(forward, strike, tau, mid, is_call) > price
+        hi = np.where(too_high, mid, hi)
+        lo = np.where(too_high, lo, mid)
+    sigma = 0.5 * (lo + hi)
+
+    valid = (tau > 0) & (price > black76_price(forward, strike, tau, low, is_call)) & \
+            (price < black76_price(forward, strike, tau, high, is_call))
+    return np.where(valid, sigma, np.nan)
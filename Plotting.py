@@ -0,0 +1,143 @@
+import os
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+def p_lines_multicol(positions_df, h=400, w=800):
+    """
+    Create a multi-column line plot for asset positions over time.
+
+    Parameters:
+    - positions_df: DataFrame containing asset positions with dates as the index.
+    - h: Height of the plot.
+    - w: Width of the plot.
+
+    Returns:
+    - fig: The Plotly figure object.
+    """
+    fig = go.Figure()
+
+    # Create a line trace for each asset
+    for asset in positions_df.columns:
+        fig.add_trace(go.Scatter(
+            x=positions_df.index,
+            y=positions_df[asset],
+            mode='lines+markers',
+            name=asset,
+            showlegend=True  # Show legend for asset positions
+        ))
+
+    # Customize the layout
+    fig.update_layout(
+        title='Asset Positions Over Time',
+        xaxis_title='Date',
+        yaxis_title='Shares Held',
+        height=h,
+        width=w,
+        xaxis=dict(type='date'),
+        legend_title='Assets'
+    )
+
+    return fig
+
+
+def plot_all(results_df):
+    results_dir = './plots/temp'
+
+    try:
+        os.makedirs(results_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Error creating directory {results_dir}: {e}")
+        return
+
+    # Convert positions to a DataFrame where each column is an asset and values are numeric quantities held
+    positions_list = results_df['positions'].tolist()
+    positions_df = pd.DataFrame([{k: v['shares'] for k, v in day.items()} for day in positions_list],
+                                index=results_df.index)
+
+    # Create a subplot figure
+    fig = make_subplots(rows=2, cols=2, subplot_titles=(
+        'Asset Positions', 'Portfolio Value', 'Cumulative Returns', 'Underlying Cumulative Return'))
+
+    # Add asset positions plot
+    for asset in positions_df.columns:
+        fig.add_trace(go.Scatter(
+            x=positions_df.index,
+            y=positions_df[asset],
+            mode='lines+markers',
+            name=asset,
+            showlegend=True  # Show legend for asset positions
+        ), row=1, col=1)
+
+    # Add vertical lines for events
+    for idx, row in results_df.iterrows():
+        if row['event'] == '移仓换月':
+            fig.add_vline(x=idx, line_color='red', line_width=2, opacity=0.7, row=1, col=1)
+        elif row['event'] == '上涨超过百分之五':
+            fig.add_vline(x=idx, line_color='yellow', line_width=2, opacity=0.7, row=1, col=1)
+        elif row['event'] == '压力测试移仓':
+            fig.add_vline(x=idx, line_color='orange', line_width=2, opacity=0.7, row=1, col=1)
+
+    # Add portfolio value plot
+    fig.add_trace(go.Scatter(
+        x=results_df.index,
+        y=results_df['portfolio_value'],
+        mode='lines',
+        name='Portfolio Value',
+        showlegend=True  # Show legend for portfolio value
+    ), row=1, col=2)
+
+    fig.add_trace(go.Scatter(
+        x=results_df.index,
+        y=results_df['cash'],
+        mode='lines',
+        name='cash',
+        showlegend=True  # Show legend for portfolio value
+    ), row=1, col=2)
+
+    # Add cumulative returns plot
+    fig.add_trace(go.Scatter(
+        x=results_df.index,
+        y=results_df['cumulative_return'],
+        mode='lines',
+        name='Cumulative Return',
+        showlegend=True  # Show legend for cumulative return
+    ), row=2, col=1)
+
+    # Add underlying cumulative return plot
+    fig.add_trace(go.Scatter(
+        x=results_df.index,
+        y=results_df['underlying_cumulative_return'],
+        mode='lines',
+        name='Underlying Cumulative Return',
+        showlegend=True  # Show legend for underlying cumulative return
+    ), row=2, col=2)
+
+    # Customize layout for the overall figure
+    fig.update_layout(
+        title="Investment Strategy Overview",
+        xaxis_title="Date",
+        height=800,
+        width=1400,
+        showlegend=True
+    )
+
+    return fig
+
+
+def merge_underlying_returns(results_df, market_data, backtest_id):
+    """
+    Join the front-month futures close of backtest_id onto the results as the underlying benchmark.
+    """
+    front_month = market_data.futures_store.continuous(backtest_id, rank=0)
+
+    merged_results = pd.merge(front_month[['date', 'close', 'uni_id']],
+                              results_df,
+                              left_on='date',
+                              right_index=True,
+                              how='right')
+
+    merged_results['underlying_return'] = merged_results['close'].pct_change()
+    merged_results['underlying_cumulative_return'] = (1 + merged_results['underlying_return']).cumprod() - 1
+    return merged_results.set_index('date')
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+import pandas as pd
+from config import config_backtest_id
+from ContractMaster import ContractMaster
+
+# Modules whose code determines the backtest results, including how the data is read and validated
+_code_modules = ['main', 'Broker', 'ExchangeSimulator', 'Strategy', 'MarginEngine', 'SmileMarker', 'OptionChain',
+                 'OptionPricing', 'ScenarioEngine', 'FuturesStore', 'ContractMaster', 'AccountingKernel', 'Metrics',
+                 'MarketData', 'DataValidator', 'DateRangeLoader', 'config', 'enums']
+
+
+def code_version() -> str:
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in _code_modules:
+        with open(os.path.join(base_dir, module + '.py'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir='.backtest_cache', max_bytes=500 * 2 ** 20):
+        """
+        On-disk cache of backtest results keyed by the strategy parameters, the data files'
+        fingerprint and the code version. The end date is not part of the key: a cached run
+        answers any earlier end date and is extended from its checkpoint for a later one.
+        Least recently used entries are evicted once the cache exceeds max_bytes.
+        """
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, market_data, start_date, init_cash=0, backtest_ids=config_backtest_id) -> str:
+        import main
+
+        params = {
+            'strategy': main.strategy_params,
+            'backtest_ids': list(backtest_ids),
+            'start_date': str(start_date),
+            'init_cash': init_cash,
+            'data': ContractMaster.fingerprint(market_data.options_path, market_data.futures_path),
+            'code': code_version(),
+        }
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._cache_dir, key + '.pkl')
+
+    def _read_index(self) -> dict:
+        if not os.path.exists(self._index_path):
+            return {}
+        with open(self._index_path) as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        with open(self._index_path, 'w') as f:
+            json.dump(index, f)
+
+    def _touch(self, key):
+        index = self._read_index()
+        if key in index:
+            index[key]['last_used'] = time.time()
+            self._write_index(index)
+
+    def load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, key, entry):
+        with open(self._path(key), 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        index = self._read_index()
+        index[key] = {'last_used': time.time(), 'size': os.path.getsize(self._path(key))}
+        self._evict(index)
+        self._write_index(index)
+
+    def _evict(self, index):
+        total = sum(item['size'] for item in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= self._max_bytes:
+                break
+            total -= index.pop(key)['size']
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    def run(self, market_data, start_date, end_date, init_cash=0, backtest_ids=config_backtest_id, progress=True):
+        """
+        run_backtest through the cache: a hit returns the stored results up to end_date,
+        a later end_date resumes the stored run, a miss runs it in full and stores it.
+        """
+        from main import build_strategy
+
+        key = self.key(market_data, start_date, init_cash, backtest_ids)
+        entry = self.load(key)
+        if entry is not None and end_date <= entry['end_date']:
+            self._touch(key)
+            results_df = entry['results']
+            return results_df[results_df.index <= end_date].copy()
+
+        if entry is None:
+            strategy = build_strategy(market_data, start_date, end_date, init_cash, backtest_ids)
+            results_df = strategy.run(progress=progress)
+            state = strategy.get_state()
+        else:
+            # Resume from the checkpoint on the first trading day after the cached run
+            trading_calender = market_data.trading_calender
+            state = entry['state']
+            next_days = trading_calender[(trading_calender > state['date']) & (trading_calender <= end_date)]
+            results_df = entry['results'].drop(columns=['cumulative_return'])
+            if len(next_days):
+                strategy = build_strategy(market_data, next_days[0], end_date, init_cash, backtest_ids)
+                strategy.set_state(state)
+                results_df = pd.concat([results_df, strategy.run(progress=progress)])
+                state = strategy.get_state()
+
+        if not results_df.empty:
+            results_df['cumulative_return'] = (1 + results_df['daily_return']).cumprod() - 1
+            self.store(key, {'end_date': end_date, 'results': results_df, 'state': state})
+        return results_df.copy()
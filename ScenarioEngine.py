@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from OptionPricing import black76_price, black76_implied_vol
+
+
+class ScenarioEngine:
+    def __init__(self, spot_shocks=(-0.10, -0.05, -0.02, 0.0, 0.02, 0.05, 0.10), vol_shocks=(-0.05, 0.0, 0.05, 0.10),
+                 fallback_vol=0.2):
+        """
+        Stress test of the open book: every leg is repriced with Black-76 on a grid of relative
+        underlying shocks x absolute vol shocks, as one broadcast (spot, vol, leg) evaluation.
+        Each leg keeps the vol implied from its current price, or fallback_vol where none can be
+        implied (e.g. quotes below intrinsic). PnL is measured against the unshocked model value,
+        so the unshocked cell is zero even for legs the model cannot reprice at their mark.
+        """
+        self._spot_shocks = np.asarray(spot_shocks, dtype=float)
+        self._vol_shocks = np.asarray(vol_shocks, dtype=float)
+        self._fallback_vol = fallback_vol
+
+    @property
+    def spot_shocks(self) -> np.ndarray:
+        return self._spot_shocks
+
+    @property
+    def vol_shocks(self) -> np.ndarray:
+        return self._vol_shocks
+
+    def pnl_grid(self, shares, prices, forwards, strikes, tau, is_call, multipliers) -> pd.DataFrame:
+        """
+        Book PnL per scenario, indexed by spot shock with one column per vol shock.
+        Legs without a positive underlying price cannot be repriced and are held at their price.
+        """
+        shares, prices, forwards, strikes, tau, multipliers = (np.asarray(a, dtype=float) for a in (
+            shares, prices, forwards, strikes, tau, multipliers))
+        is_call = np.asarray(is_call, dtype=bool)
+
+        sigma = black76_implied_vol(prices, forwards, strikes, tau, is_call)
+        sigma = np.where(np.isnan(sigma), self._fallback_vol, sigma)
+        repriceable = np.isfinite(forwards) & (forwards > 0)
+
+        # (spot, vol, leg) grid
+        shocked_forwards = forwards * (1 + self._spot_shocks[:, None, None])
+        shocked_sigma = np.maximum(sigma + self._vol_shocks[None, :, None], 1e-4)
+        values = black76_price(shocked_forwards, strikes, tau, shocked_sigma, is_call)
+        base_values = black76_price(forwards, strikes, tau, sigma, is_call)
+        pnl = np.where(repriceable, values - base_values, 0.0) * shares * multipliers
+
+        return pd.DataFrame(pnl.sum(axis=2), index=pd.Index(self._spot_shocks, name='spot_shock'),
+                            columns=pd.Index(self._vol_shocks, name='vol_shock'))
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from OptionPricing import black76_price, black76_implied_vol
+
+
+class SmileMarker:
+    def __init__(self, contracts, degree=2):
+        """
+        Model marks for contracts without a quote on the day.
+        A smile (implied vol quadratic in log-moneyness) is fitted per expiry over the
+        available strikes, once per trading day and for all expiries in one batch.
+        Marking a missing strike is then a dict lookup plus one Black-76 evaluation.
+        """
+        self._contracts = contracts  # ContractMaster, contracts are marked by cid
+        self._degree = degree
+        self._price_df = None
+        self._trading_date = None
+        self._fits = None  # {underlying_id: (coeffs, k_min, k_max, forward, tau)}
+
+    def reset(self, price_df: pd.DataFrame, trading_date):
+        # The fit is deferred until the first missing quote of the day
+        self._price_df = price_df
+        self._trading_date = pd.Timestamp(trading_date)
+        self._fits = None
+
+    @property
+    def fits(self) -> dict:
+        if self._fits is None:
+            self._fits = self._fit_all()
+        return self._fits
+
+    def _fit_all(self) -> dict:
+        df = self._price_df
+        if df is None or df.empty:
+            return {}
+
+        forward = df['close_underlying'].to_numpy(dtype=float)
+        strike = df['strike_price'].to_numpy(dtype=float)
+        tau = (pd.to_datetime(df['de_listed_date']) - self._trading_date).dt.days.to_numpy(dtype=float) / 365
+        is_call = (df['option_type'] == 'C').to_numpy()
+        iv = black76_implied_vol(df['close'].to_numpy(dtype=float), forward, strike, tau, is_call)
+        log_moneyness = np.log(strike / forward)
+
+        fits = {}
+        valid = ~np.isnan(iv)
+        for underlying_id, idx in df.groupby('underlying_id').indices.items():
+            idx = idx[valid[idx]]
+            if len(idx) == 0:
+                continue
+            degree = min(self._degree, len(idx) - 1)
+            coeffs = np.polyfit(log_moneyness[idx], iv[idx], degree)
+            fits[underlying_id] = (coeffs, log_moneyness[idx].min(), log_moneyness[idx].max(),
+                                   forward[idx[0]], tau[idx[0]])
+        return fits
+
+    def forward(self, cid: int):
+        fit = self.fits.get(self._contracts.underlying_id[cid])
+        return None if fit is None else fit[3]
+
+    def mark(self, cid: int):
+        """
+        Model price of the option, or None when its expiry has no fitted smile today.
+        """
+        fit = self.fits.get(self._contracts.underlying_id[cid])
+        if fit is None:
+            return None
+        strike = self._contracts.strike[cid]
+        coeffs, k_min, k_max, forward, tau = fit
+        # Flat extrapolation outside the quoted strikes
+        log_moneyness = min(max(np.log(strike / forward), k_min), k_max)
+        sigma = max(np.polyval(coeffs, log_moneyness), 1e-4)
+        return float(black76_price(forward, strike, tau, sigma, self._contracts.option_type[cid] == 'C'))
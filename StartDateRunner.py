@@ -0,0 +1,61 @@
+import multiprocessing as mp
+import pandas as pd
+from MarketData import MarketData
+
+# MarketData shared by the worker processes: inherited on fork, or sent once per worker otherwise
+_shared = {}
+
+
+def _init_worker(market_data):
+    if market_data is not None:
+        _shared['market_data'] = market_data
+
+
+def _run_from(args):
+    from main import run_backtest
+
+    start_date, end_date, init_cash = args
+    results_df = run_backtest(_shared['market_data'], start_date, end_date, init_cash=init_cash, progress=False)
+    return start_date, results_df.drop(columns=['positions', 'transactions'], errors='ignore')
+
+
+def start_dates(trading_calender, every=1, window=None):
+    """
+    Every `every`-th trading day of the calendar, optionally restricted to window=(first, last).
+    """
+    dates = pd.Index(sorted(trading_calender))
+    if window is not None:
+        dates = dates[(dates >= window[0]) & (dates <= window[1])]
+    return list(dates[::every])
+
+
+def run_start_dates(dates, end_date, market_data=None, init_cash=0, field='cumulative_return', processes=None):
+    """
+    Runs the strategy from each start date in parallel worker processes and returns the
+    `field` equity curves as one (trading date x start date) matrix, NaN before each start.
+    A start date without trading days up to end_date gives an all-NaN curve.
+    The dataset is loaded once in the parent and shared with the workers.
+    """
+    market_data = (market_data if market_data is not None else MarketData()).load()
+    _init_worker(market_data)
+
+    if 'fork' in mp.get_all_start_methods():
+        # Workers inherit _shared copy-on-write, nothing is pickled
+        context, init_args = mp.get_context('fork'), (None,)
+    else:
+        context, init_args = mp.get_context(), (market_data,)
+
+    tasks = [(start_date, end_date, init_cash) for start_date in dates]
+    with context.Pool(processes, initializer=_init_worker, initargs=init_args) as pool:
+        curves = {start_date: results_df[field] if field in results_df.columns else pd.Series(dtype=float)
+                  for start_date, results_df in pool.imap_unordered(_run_from, tasks)}
+
+    return pd.DataFrame(curves).sort_index()[list(dates)]
+
+
+def start_date_distribution(equity_matrix):
+    """
+    Distribution across start dates of the last value of each curve.
+    """
+    final_values = equity_matrix.apply(lambda curve: curve.dropna().iloc[-1] if curve.notna().any() else None)
+    return final_values.astype(float).describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95])
@@ -11,6 +11,15 @@ class Base_Strategy:
         self.__broker = broker
         self.__results = []
         self.__last_portfolio_value = broker.portfolio_value
+        # Live quotes from a feed attached to the exchange are passed to on_quote
+        exchange.subscribe_quotes(self.on_quote)
+
+    def on_quote(self, quote: dict, book):
+        """
+        Called for every live quote with the quote and the updated QuoteBook.
+        Override to react to updates intraday; the default does nothing.
+        """
+        pass
 
     @property
     def broker(self):
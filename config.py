@@ -1 +1,18 @@
 config_backtest_id = ['IH']  # ['IH' 50, 'IF' 300, 'IM' 1000]
+
+# 交易所代码 (中金所)
+config_exchange_symbol = 'ZJS'
+
+# 中金所股指期权: 合约乘数, 保证金调整系数, 最低保障系数
+config_contract_multiplier = 100
+config_margin_ratio = 0.10
+config_min_margin_coef = 0.5
+
+# 期权代码前缀 -> 标的期货代码前缀
+config_underlying_map = {'HO': 'IH', 'IO': 'IF', 'MO': 'IM'}
+
+# 股指期货合约乘数
+config_future_multiplier = {'IH': 300, 'IF': 300, 'IC': 200, 'IM': 200}
+
+# 手续费率 (按行权价名义计)
+config_commission_rate = 0.00
@@ -1,35 +1,49 @@
+import numpy as np
 import pandas as pd
 from enums import ExchangeTypes
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from config import config_backtest_id
+from config import config_backtest_id, config_commission_rate, config_exchange_symbol
 from copy import deepcopy
-from tqdm import tqdm
 
+from AccountingKernel import ERROR_MESSAGES, NO_ERROR, fill, mark
 from ExchangeSimulator import Base_Exchange
 from Broker import Base_Broker
+from MarginEngine import MarginEngine
+from MarketData import MarketData
+from Metrics import MetricsAccumulator
+from OptionChain import OptionChain
+from ScenarioEngine import ScenarioEngine
+from SmileMarker import SmileMarker
 from Strategy import Base_Strategy
+import queue
+import threading
 import warnings
-import os
 
 warnings.filterwarnings("ignore")
 
 
 class Exchange(Base_Exchange):
-    def __init__(self, exchange_symbol, trading_calender, exchange_type, start_date, end_date, future_data,
-                 backtest_ids):
+    def __init__(self, exchange_symbol, trading_calender, exchange_type, start_date, end_date, market_data,
+                 backtest_ids, daily_source=None):
         super().__init__(exchange_symbol, trading_calender, exchange_type, start_date, end_date)
-        self.cached_data = None
+        self.market_data = market_data  # Shared MarketData, loaded once
+        self.daily_source = daily_source  # Optional per-day data source, e.g. IntradaySimulator.DailyBarAdapter
         self.pre_price_data = None
-        self.future_data = future_data  # Pass future_data into the Exchange class
+        self.futures_store = market_data.futures_store
+        self.contracts = market_data.contract_master  # Contracts are keyed by their integer id (cid)
         self.backtest_ids = backtest_ids  # Backtest IDs passed to the Exchange
+        self.smile_marker = SmileMarker(self.contracts)  # Model marks for contracts missing from the day's quotes
+        self._curr_chain = None
 
-    def request_data(self, method='hist'):
+    @property
+    def curr_chain(self):
+        return self._curr_chain
+
+    def request_data(self, method='hist', trading_date=None):
         if method == 'hist':
-            if self.cached_data is None:
-                # Cache data to avoid repeated disk I/O
-                self.cached_data = pd.read_csv('CleanedData_options.csv', index_col=0)
-            return self.cached_data
+            if self.daily_source is not None:
+                return self.daily_source.day(self.curr_trading_time if trading_date is None else trading_date)
+            return self.market_data.options
+        return super().request_data(method)
 
     def process_contracts(self, price_data, trading_date):
         # Generate month and contract identifiers
@@ -43,162 +57,222 @@ class Exchange(Base_Exchange):
         next_month_list = [id + next_month for id in self.backtest_ids]
         next_next_month_list = [id + next_next_month for id in self.backtest_ids]
 
-        # Filter future contracts for the relevant months
-        future_contracts = self.future_data.loc[
-            self.future_data.index.isin(curr_month_list + next_month_list + next_next_month_list, level=1)
-        ].loc[trading_date]
+        # Look up the future closes for the relevant months
+        future_closes = self.futures_store.closes(trading_date,
+                                                  curr_month_list + next_month_list + next_next_month_list)
+
+        # Key contracts by their integer id from here on
+        if 'cid' not in price_data.columns:
+            price_data = price_data.assign(cid=self.contracts.cids(price_data.index))
+        price_data = price_data[price_data['cid'] >= 0].reset_index().set_index('cid')
 
         # Merge option and future contracts to get combined data
-        option_contracts = pd.merge(left=price_data, right=future_contracts, left_on='underlying_id',
-                                    right_index=True, suffixes=('', '_underlying'))
+        option_contracts = pd.merge(left=price_data, right=future_closes.to_frame(), left_on='underlying_id',
+                                    right_index=True)
+
+        # Sorted strike ladders for both option types, queried by bisection
+        chain = OptionChain(option_contracts, trading_date)
 
         # Filter only put options ('P')
         option_contracts = option_contracts[option_contracts['option_type'] == 'P']
 
-        # Group by underlying_id and filter contracts for sell and buy based on strike price
-        sell_contracts = option_contracts.groupby('underlying_id').apply(
-            lambda group: group[group['strike_price'] > group['close_underlying'].iloc[0]]
-        ).reset_index(level=0, drop=True).sort_values(by=['underlying_id', 'strike_price'], ascending=[True, True])
-
-        buy_contracts = option_contracts.groupby('underlying_id').apply(
-            lambda group: group[group['strike_price'] < group['close_underlying'].iloc[0]]
-        ).reset_index(level=0, drop=True).sort_values(by=['underlying_id', 'strike_price'], ascending=[True, False])
+        # Filter contracts for sell and buy based on strike price against their underlying
+        sell_contracts = option_contracts[option_contracts['strike_price'] > option_contracts['close_underlying']] \
+            .sort_values(by=['underlying_id', 'strike_price'], ascending=[True, True])
+        buy_contracts = option_contracts[option_contracts['strike_price'] < option_contracts['close_underlying']] \
+            .sort_values(by=['underlying_id', 'strike_price'], ascending=[True, False])
+
+        return sell_contracts, buy_contracts, option_contracts, chain
+
+    def prepare_day(self, trading_date):
+        """
+        Data preparation for one day, independent of the strategy and of the exchange state:
+        request, filter and join the day's contracts. Returns None if nothing trades that day.
+        """
+        # Request price data for the day and keep the contracts trading
+        day = self.select_day(self.request_data(trading_date=trading_date), trading_date)
+        if day is None:
+            return None
+        info_df, price_df = day
+
+        sell_contracts, buy_contracts, option_contracts, chain = self.process_contracts(price_df, trading_date)
+        return info_df, option_contracts, sell_contracts, buy_contracts, chain
+
+    def install_day(self, trading_date, prepared):
+        # Set the current trading time and the prepared data as the exchange state
+        self._curr_trading_time = trading_date
+        if prepared is None:
+            return None
+        info_df, option_contracts, sell_contracts, buy_contracts, chain = prepared
+        self._curr_info_df = info_df
+        self._curr_price_df = option_contracts
+        self._curr_chain = chain
+        self._backtest_activate_info = True
+        self._backtest_activate_data = True
+        self.smile_marker.reset(option_contracts, trading_date)
+
+        # Return the current trading time, info, price data, and filtered contracts
+        return self.curr_trading_time, self.curr_info_df, self.curr_price_df, sell_contracts, buy_contracts
 
-        return sell_contracts, buy_contracts, option_contracts
+    def __next__(self):
+        # Calendar dates without data (e.g. gaps in an intraday bar file) are skipped
+        while self.current_idx < len(self.trading_calender):
+            trading_date = self.trading_calender[self.current_idx]
+            self.current_idx += 1
+            prepared = self.prepare_day(trading_date)
+            if prepared is not None:
+                return self.install_day(trading_date, prepared)
+        raise StopIteration
+
+    def close(self):
+        pass
+
+
+class PipelinedExchange(Exchange):
+    _end = object()
+
+    def __init__(self, *args, prefetch_depth=2, **kwargs):
+        """
+        Exchange that prepares the next days in a background thread while the strategy
+        runs on the current one. Days are prepared in calendar order by a single worker
+        and handed over through a bounded queue, so the sequence is the same as Exchange's.
+        """
+        super().__init__(*args, **kwargs)
+        self._prefetch_depth = prefetch_depth
+        self._queue = None
+        self._worker = None
+        self._stop = threading.Event()
+        self._done = False  # Set once the end or an error was handed over; the worker has exited
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _prefetch(self, start_idx):
+        for idx in range(start_idx, len(self.trading_calender)):
+            trading_date = self.trading_calender[idx]
+            try:
+                item = (trading_date, self.prepare_day(trading_date), None)
+            except Exception as e:
+                item = (trading_date, None, e)
+            if not self._put(item):
+                return
+            if item[2] is not None:
+                break
+        self._put(self._end)
 
     def __next__(self):
-        if self.current_idx >= len(self.trading_calender):
+        if self._done:
             raise StopIteration
-
-        # Set the current trading time
-        self._curr_trading_time = self.trading_calender[self.current_idx]
-        self.current_idx += 1
-
-        # Request price data for the current day
-        price_data = self.request_data()
-
-        # Ingest the data into the exchange
-        self.ingest(price_data)
-
-        # If both backtest info and data are available, process contracts
-        if self._backtest_activate_info and self._backtest_activate_data:
-            sell_contracts, buy_contracts, option_contracts = self.process_contracts(self.curr_price_df,
-                                                                                     self.curr_trading_time)
-            self._curr_price_df = option_contracts
-
-            # Return the current trading time, info, price data, and filtered contracts
-            return self.curr_trading_time, self.curr_info_df, self.curr_price_df, sell_contracts, buy_contracts
+        if self._worker is None:
+            self._queue = queue.Queue(maxsize=self._prefetch_depth)
+            self._worker = threading.Thread(target=self._prefetch, args=(self.current_idx,), daemon=True)
+            self._worker.start()
+
+        while True:
+            item = self._queue.get()
+            if item is self._end:
+                self._done = True
+                raise StopIteration
+            trading_date, prepared, error = item
+            self.current_idx += 1
+            if error is not None:
+                self._done = True
+                raise error
+            if prepared is not None:
+                return self.install_day(trading_date, prepared)
+
+    def close(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
 
 
 class Broker(Base_Broker):
     def __init__(self, init_cash, exchange):
         super().__init__(init_cash, exchange)
-
-    def buy_option(self, option_id, quantity):
-        try:
-            try:
-                price = self.exchange.curr_price_df.loc[option_id, 'close']
-                strike = self.exchange.curr_price_df.loc[option_id, 'strike_price']
-                de_listed_date = self.exchange.curr_price_df.loc[option_id, 'de_listed_date']
-                entry_price = self.exchange.curr_price_df.loc[option_id, 'close_underlying']
-            except:
-                price = self.exchange.pre_price_data.loc[option_id, 'close']
-                strike = self.exchange.pre_price_data.loc[option_id, 'strike_price']
-                de_listed_date = self.exchange.pre_price_data.loc[option_id, 'de_listed_date']
-                entry_price = self.exchange.pre_price_data.loc[option_id, 'close_underlying']
-        except:
-            price = self.positions[option_id]['avg_price']
-            strike = int(option_id.split('-')[-1])
-            de_listed_date = 0
-            entry_price = 0
-
-        total_cost = price * quantity * 100
-        commission = strike * quantity * 0.00
-        total_cost += commission
-
-        if option_id in self.positions:
-            if self.positions[option_id]['shares'] < 0:  # If the position is a short
-                short_position = abs(self.positions[option_id]['shares'])
-                if quantity <= short_position:
-                    self.cash -= total_cost
-                    self.positions[option_id]['shares'] += quantity
-                    if self.positions[option_id]['shares'] == 0:
-                        del self.positions[option_id]
-                else:
-                    raise ValueError("Trying to buy more than what was shorted.")
-            else:
-                # Regular long position
-                self.cash -= total_cost
-                self.positions[option_id]['shares'] += quantity
-                self.positions[option_id]['avg_price'] = (
-                                                                 (self.positions[option_id]['avg_price'] *
-                                                                  self.positions[option_id]['shares']) + total_cost
-                                                         ) / (self.positions[option_id]['shares'] + quantity)
-        else:
-            self.cash -= total_cost
+        self.margin_engine = MarginEngine(exchange.contracts)
+        self.scenario_engine = ScenarioEngine()
+        self.model_marks = {}  # Positions marked from the smile on the current day
+
+    def quote(self, option_id):
+        """
+        Price source for an order: today's quote, then the smile model mark,
+        then the previous day's quote, then the position's average price.
+        Returns (price, strike, de_listed_date, entry_price, price_source).
+        """
+        curr_price_df = self.exchange.curr_price_df
+        if option_id in curr_price_df.index:
+            row = curr_price_df.loc[option_id]
+            return row['close'], row['strike_price'], row['de_listed_date'], row['close_underlying'], 'market'
+
+        contracts = self.exchange.contracts
+        model_price = self.exchange.smile_marker.mark(option_id)
+        if model_price is not None:
+            return model_price, contracts.strike[option_id], pd.Timestamp(contracts.expiry[option_id]), \
+                self.exchange.smile_marker.forward(option_id), 'model'
+
+        pre_price_data = self.exchange.pre_price_data
+        if pre_price_data is not None and option_id in pre_price_data.index:
+            pre_row = pre_price_data.loc[option_id]
+            return pre_row['close'], pre_row['strike_price'], pre_row['de_listed_date'], \
+                pre_row['close_underlying'], 'previous'
+
+        return self.positions[option_id]['avg_price'], contracts.strike[option_id], \
+            pd.Timestamp(contracts.expiry[option_id]), 0, 'cost'
+
+    def _fill(self, option_id, quantity, price, strike, de_listed_date, entry_price):
+        # Signed quantity: > 0 buys, < 0 sells; the arithmetic is shared with AccountingBook
+        position = self.positions.get(option_id)
+        shares, avg_price = (position['shares'], position['avg_price']) if position is not None else (0, 0.0)
+        shares, avg_price, cash_delta, error = fill(shares, float(avg_price), quantity, float(price),
+                                                    float(self.exchange.contracts.multiplier[option_id]),
+                                                    float(strike), config_commission_rate)
+        if error != NO_ERROR:
+            raise ValueError(ERROR_MESSAGES[error])
+
+        self.cash += cash_delta
+        if shares == 0:
+            del self.positions[option_id]
+        elif position is None:
             self.positions[option_id] = {
-                'shares': quantity,
-                'avg_price': price,
+                'shares': shares,
+                'avg_price': avg_price,
                 'de_listed_date': de_listed_date,
                 'entry_price': entry_price
             }
+        else:
+            position['shares'] = shares
+            position['avg_price'] = avg_price
+
+    def buy_option(self, option_id, quantity):
+        price, strike, de_listed_date, entry_price, price_source = self.quote(option_id)
+        self._fill(option_id, quantity, price, strike, de_listed_date, entry_price)
 
         self.orders.append({
             'action': 'buy',
             'option_id': option_id,
             'quantity': quantity,
             'price': price,
+            'price_source': price_source,
             'date': self.curr_trading_time
         })
 
     def sell_option(self, option_id, quantity):
-        try:
-            try:
-                price = self.exchange.curr_price_df.loc[option_id, 'close']
-                strike = self.exchange.curr_price_df.loc[option_id, 'strike_price']
-                de_listed_date = self.exchange.curr_price_df.loc[option_id, 'de_listed_date']
-                entry_price = self.exchange.curr_price_df.loc[option_id, 'close_underlying']
-            except:
-                price = self.exchange.pre_price_data.loc[option_id, 'close']
-                strike = self.exchange.pre_price_data.loc[option_id, 'strike_price']
-                de_listed_date = self.exchange.pre_price_data.loc[option_id, 'de_listed_date']
-                entry_price = self.exchange.pre_price_data.loc[option_id, 'close_underlying']
-        except:
-            price = self.positions[option_id]['avg_price']
-            strike = int(option_id.split('-')[-1])
-            de_listed_date = 0
-            entry_price = 0
-
-        total_revenue = price * quantity * 100  # Contract size is 100 units per option
-        commission = strike * quantity * 0.00  # 0.3% transaction fee
-        total_revenue -= commission
-
-        if option_id in self.positions:
-            if self.positions[option_id]['shares'] > 0:
-                if self.positions[option_id]['shares'] >= quantity:
-                    self.positions[option_id]['shares'] -= quantity
-                    self.cash += total_revenue
-                    if self.positions[option_id]['shares'] == 0:
-                        del self.positions[option_id]
-                else:
-                    raise ValueError("Trying to sell more than current long position.")
-            else:
-                self.positions[option_id]['shares'] -= quantity
-                self.cash += total_revenue
-        else:
-            self.positions[option_id] = {
-                'shares': -quantity,
-                'avg_price': price,
-                'de_listed_date': de_listed_date,
-                'entry_price': entry_price
-            }
-            self.cash += total_revenue
+        price, strike, de_listed_date, entry_price, price_source = self.quote(option_id)
+        self._fill(option_id, -quantity, price, strike, de_listed_date, entry_price)
 
         self.orders.append({
             'action': 'sell',
             'option_id': option_id,
             'quantity': quantity,
             'price': price,
+            'price_source': price_source,
             'date': self.curr_trading_time
         })
 
@@ -211,46 +285,133 @@ class Broker(Base_Broker):
                 self.buy_option(option_id, abs(position['shares']))
 
     def update_portfolio_value(self):
-        total_value = self.cash
-        premium_value = 0  # Represents the total cost of all open options
-        nominal_value = 0  # Represents the notional value of the underlying assets
-
-        for option_id, position in self.positions.items():
-            try:
-                market_price = self.exchange.curr_price_df.loc[option_id]['close']
-                strike_price = self.exchange.curr_price_df.loc[option_id]['strike_price']
-            except:
-                market_price = self.positions[option_id]['avg_price']
-                strike_price = int(option_id.split('-')[-1])
-            # TODO: 名义本金和权利金计算
-
-            if position['shares'] > 0:  # Long position
-                total_value += market_price * position['shares'] * 100
-                premium_value += position['avg_price'] * position['shares'] * 100
-                nominal_value += strike_price * position['shares'] * 100
-            else:  # Short position
-                total_value -= market_price * abs(position['shares']) * 100
-                premium_value -= position['avg_price'] * abs(position['shares']) * 100
-                nominal_value += strike_price * abs(position['shares']) * 100
-
-        self.portfolio_value = total_value
-        self.premium_value = premium_value
-        self.nominal_value = nominal_value
-
-
-buy = 0
-sell = 2
-buy_far = 0
-
+        n_positions = len(self.positions)
+        shares = np.empty(n_positions, dtype=np.int64)
+        avg_prices = np.empty(n_positions)
+        market_prices = np.empty(n_positions)
+        strike_prices = np.empty(n_positions)
+        multipliers = np.empty(n_positions)
+
+        curr_price_df = self.exchange.curr_price_df
+        self.model_marks = {}
+        for i, (option_id, position) in enumerate(self.positions.items()):
+            if option_id in curr_price_df.index:
+                market_price = curr_price_df.loc[option_id, 'close']
+                strike_price = curr_price_df.loc[option_id, 'strike_price']
+            else:
+                strike_price = self.exchange.contracts.strike[option_id]
+                market_price = self.exchange.smile_marker.mark(option_id)
+                if market_price is None:
+                    market_price = self.positions[option_id]['avg_price']
+                else:
+                    self.model_marks[option_id] = market_price
+            shares[i] = position['shares']
+            avg_prices[i] = position['avg_price']
+            market_prices[i] = market_price
+            strike_prices[i] = strike_price
+            multipliers[i] = self.exchange.contracts.multiplier[option_id]
+
+        # Portfolio value, total cost of all open options and notional value of the underlying assets
+        self.portfolio_value, self.premium_value, self.nominal_value = mark(
+            float(self.cash), shares, avg_prices, market_prices, strike_prices, multipliers)
+
+        # Exchange margin on the short legs, recomputed for all legs in one pass
+        self.margin_engine.sync_positions(self.positions)
+        self.margin_value = self.margin_engine.update(self.exchange.curr_price_df)
+
+    def scenario_pnl(self) -> pd.DataFrame:
+        """
+        PnL of the open positions on the scenario engine's grid of underlying and vol shocks,
+        each leg priced from the same sources as an order.
+        """
+        n_positions = len(self.positions)
+        shares = np.empty(n_positions)
+        prices = np.empty(n_positions)
+        forwards = np.empty(n_positions)
+        strikes = np.empty(n_positions)
+        tau = np.empty(n_positions)
+        multipliers = np.empty(n_positions)
+
+        contracts = self.exchange.contracts
+        trading_date_timestamp = pd.Timestamp(self.curr_trading_time)
+        for i, (option_id, position) in enumerate(self.positions.items()):
+            price, strike, de_listed_date, underlying, _ = self.quote(option_id)
+            shares[i] = position['shares']
+            prices[i] = price
+            forwards[i] = underlying
+            strikes[i] = strike
+            tau[i] = (pd.Timestamp(de_listed_date) - trading_date_timestamp).days / 365
+            multipliers[i] = contracts.multiplier[option_id]
+        is_call = contracts.option_type[list(self.positions.keys())] == 'C'
+
+        return self.scenario_engine.pnl_grid(shares, prices, forwards, strikes, tau, is_call, multipliers)
+
+    def get_state(self):
+        # Account state at the end of a day, to resume the run later
+        return {
+            'cash': self.cash,
+            'positions': deepcopy(self.positions),
+            'portfolio_value': self.portfolio_value,
+            'premium_value': self.premium_value,
+            'nominal_value': self.nominal_value,
+            'margin_value': self.margin_value,
+            'margin_engine': self.margin_engine.get_state(),
+        }
+
+    def set_state(self, state):
+        self.cash = state['cash']
+        self.positions.clear()
+        self.positions.update(deepcopy(state['positions']))
+        self.portfolio_value = state['portfolio_value']
+        self.premium_value = state['premium_value']
+        self.nominal_value = state['nominal_value']
+        self.margin_value = state['margin_value']
+        self.margin_engine.set_state(state['margin_engine'])
+
+
+# 策略参数: every knob of the strategy, read by Strategy and by the ResultCache key
+strategy_params = {
+    # 档: k-th strike away from ATM
+    'buy': 0,
+    'sell': 2,
+    'buy_far': 0,
+    # 远近月份档: expiry rank of the legs (0 = front month) when opening and when rolling,
+    # and how many expiries further out the far leg sits
+    'open_expiry': 0,
+    'roll_expiry': 1,
+    'buy_far_expiry': 0,
+    # 压力测试: re-strike the book when its worst scenario loss exceeds this fraction of the
+    # nominal value (None disables the check)
+    'stress_limit': None,
+}
 
-# TODO: like this buy sell 档, create 远近月份档
 
 class Strategy(Base_Strategy):
-    def __init__(self, broker, exchange):
+    def __init__(self, broker, exchange, market_data=None, record_daily=True, metrics_window=20):
         super().__init__(broker, exchange)
-        self.future_data = pd.read_csv('CleanedData_futures.csv', index_col=0).set_index(['date', 'uni_id'])
+        self.market_data = market_data if market_data is not None else exchange.market_data
+        self.future_data = self.market_data.futures_by_date_id
+        # With record_daily=False only the streaming metrics are kept, e.g. in sweeps
+        self.record_daily = record_daily
+        self.metrics = MetricsAccumulator(window=metrics_window)
+        self.params = dict(strategy_params)
         self.__results = []
+        self.__n_orders = 0
         self.__last_portfolio_value = broker.portfolio_value
+        self.__last_margin_value = broker.margin_value
+
+    def select_legs(self, expiry_rank):
+        """
+        Leg ids from the day's option chain, or None if a leg does not exist at that expiry.
+        """
+        chain = self.exchange.curr_chain
+        params = self.params
+        sell_contract_id = chain.above_atm(params['sell'], 'P', expiry_rank)
+        buy_contract_id = chain.below_atm(params['buy'], 'P', expiry_rank)
+        buy_contract_id_far = chain.above_atm(params['buy_far'], 'P', expiry_rank + params['buy_far_expiry'])
+        if sell_contract_id is None or buy_contract_id is None or buy_contract_id_far is None:
+            return None
+        return sell_contract_id, buy_contract_id, buy_contract_id_far
 
     def execute_trade(self, sell_contract_id, buy_contract_id, buy_contract_id_far):
         # self.broker.buy_option(buy_contract_id_far, 1)
@@ -266,10 +427,9 @@ class Strategy(Base_Strategy):
 
         if not self.broker.positions:
             if not sell_contracts.empty and not buy_contracts.empty:
-                sell_contract_id = sell_contracts.index[sell]
-                buy_contract_id = buy_contracts.index[buy]
-                buy_contract_id_far = sell_contracts.index[buy_far]
-                self.execute_trade(sell_contract_id, buy_contract_id, buy_contract_id_far)
+                legs = self.select_legs(self.params['open_expiry'])
+                if legs is not None:
+                    self.execute_trade(*legs)
 
         else:
             if not sell_contracts.empty and not buy_contracts.empty:
@@ -277,49 +437,27 @@ class Strategy(Base_Strategy):
                     position = self.broker.positions[option_id]
                     days_to_expiry = (
                             pd.to_datetime(position['de_listed_date']) - trading_date_timestamp).days
-                    atm_strike = self.exchange.curr_price_df.loc[
-                        option_id, 'close_underlying'] if option_id in self.exchange.curr_price_df.index else position[
-                        'entry_price']
-
                     if days_to_expiry <= 5:
                         event = '移仓换月'
                         self.broker.close_all_positions()
 
-                        underlying_ids = sell_contracts.underlying_id.unique()
-                        underlying_ids.sort()
-
-                        try:
-                            sell_contract_id = \
-                                sell_contracts[sell_contracts['underlying_id'] == underlying_ids[1]].index[sell]
-                            buy_contract_id = \
-                                buy_contracts[buy_contracts['underlying_id'] == underlying_ids[1]].index[
-                                    buy]
-                            buy_contract_id_far = \
-                                sell_contracts[sell_contracts['underlying_id'] == underlying_ids[1]].index[buy_far]
-                        except:
-                            sell_contract_id = \
-                                sell_contracts[sell_contracts['underlying_id'] == underlying_ids[0]].index[sell]
-                            buy_contract_id = \
-                                buy_contracts[buy_contracts['underlying_id'] == underlying_ids[0]].index[
-                                    buy]
-                            buy_contract_id_far = \
-                                sell_contracts[sell_contracts['underlying_id'] == underlying_ids[0]].index[buy_far]
-
-                        self.execute_trade(sell_contract_id, buy_contract_id, buy_contract_id_far)
+                        legs = self.select_legs(self.params['roll_expiry'])
+                        if legs is None:
+                            legs = self.select_legs(self.params['open_expiry'])
+                        if legs is not None:
+                            self.execute_trade(*legs)
                         break
 
-                    # elif (atm_strike - position['entry_price']) / position['entry_price'] >= 0.05:
-                    #     event = '上涨超过百分之五'
-                    #     self.broker.close_all_positions()
-                    #     if not sell_contracts.empty and not buy_contracts.empty:
-                    #         sell_contract_id = sell_contracts.index[sell]
-                    #         buy_contract_id = buy_contracts.index[buy]
-                    #         try:
-                    #             buy_contract_id_far = sell_contracts.index[buy_far]
-                    #         except:
-                    #             buy_contract_id_far = sell_contracts.index[]
-                    #         self.execute_trade(sell_contract_id, buy_contract_id, buy_contract_id_far)
-                    #     break
+                stress_limit = self.params['stress_limit']
+                if event is None and stress_limit is not None and self.broker.nominal_value:
+                    # Re-strike around the current ATM when a ±spot/vol shock would lose too much
+                    worst_loss = -self.broker.scenario_pnl().to_numpy().min()
+                    if worst_loss > stress_limit * self.broker.nominal_value:
+                        event = '压力测试移仓'
+                        self.broker.close_all_positions()
+                        legs = self.select_legs(self.params['open_expiry'])
+                        if legs is not None:
+                            self.execute_trade(*legs)
 
         ############################ after trading ############################
         self.exchange.pre_price_data = price_data
@@ -329,19 +467,32 @@ class Strategy(Base_Strategy):
             daily_return = (portfolio_value - self.__last_portfolio_value) / self.broker.nominal_value
         except:
             daily_return = 0
+        # Return on the margin posted at the previous close
+        margin_return = (portfolio_value - self.__last_portfolio_value) / self.__last_margin_value \
+            if self.__last_margin_value else 0
         self.__last_portfolio_value = portfolio_value
+        self.__last_margin_value = self.broker.margin_value
 
-        # Log transactions for the current trading day
+        # Log transactions for the current trading day, the orders placed since the previous day
         transactions = []
-        for order in self.broker.orders:
+        turnover = 0.0
+        for order in self.broker.orders[self.__n_orders:]:
             if order['date'] == trading_date and order['action'] in ['buy', 'sell']:
+                turnover += abs(order['quantity']) * order['price'] * \
+                    self.exchange.contracts.multiplier[order['option_id']]
                 transactions.append({
                     'option_id': order['option_id'],
                     'action': order['action'],
                     'quantity': order['quantity'],
                     'price': order['price'],
+                    'price_source': order['price_source'],
                     'date': order['date']
                 })
+        self.__n_orders = len(self.broker.orders)
+        self.metrics.update(daily_return, turnover)
+
+        if not self.record_daily:
+            return
 
         # Store daily results
         self.__results.append({
@@ -351,11 +502,40 @@ class Strategy(Base_Strategy):
             'positions': deepcopy(self.broker.positions),
             'transactions': transactions,
             'daily_return': daily_return,
+            'margin': self.broker.margin_value,
+            'margin_return': margin_return,
+            'model_marks': dict(self.broker.model_marks),
             'event': event
         })
 
-    def run(self):
-        for _ in tqdm(self, total=len(self.exchange.trading_calender)):
+    def get_state(self):
+        """
+        Checkpoint at the end of the last processed day; a strategy over the following days
+        continues from it with set_state.
+        """
+        return {
+            'date': self.exchange.curr_trading_time,
+            'broker': self.broker.get_state(),
+            'pre_price_data': self.exchange.pre_price_data,
+            'last_portfolio_value': self.__last_portfolio_value,
+            'last_margin_value': self.__last_margin_value,
+            'metrics': deepcopy(self.metrics),
+        }
+
+    def set_state(self, state):
+        self.broker.set_state(state['broker'])
+        self.exchange.pre_price_data = state['pre_price_data']
+        self.__last_portfolio_value = state['last_portfolio_value']
+        self.__last_margin_value = state['last_margin_value']
+        self.metrics = deepcopy(state['metrics'])
+
+    def run(self, progress=True):
+        if progress:
+            from tqdm import tqdm
+            days = tqdm(self, total=len(self.exchange.trading_calender))
+        else:
+            days = self
+        for _ in days:
             pass
             # print('-' * 40)
             # print(f"PROCESSING DATE:  {self.exchange.curr_trading_time}")
@@ -363,168 +543,83 @@ class Strategy(Base_Strategy):
             # print(f"PORTFOLIO VALUE {self.broker.portfolio_value}")
             # print(f"PORTFOLIO positions {self.broker.positions}")
 
+        # Report contracts by uni_id
+        contracts = self.exchange.contracts
+        for result in self.__results:
+            result['positions'] = {contracts.uni_id(cid): position for cid, position in result['positions'].items()}
+            result['transactions'] = [{**transaction, 'option_id': contracts.uni_id(transaction['option_id'])}
+                                      for transaction in result['transactions']]
+            result['model_marks'] = {contracts.uni_id(cid): price for cid, price in result['model_marks'].items()}
+
         # Convert results to DataFrame
         results_df = pd.DataFrame(self.__results)
-        results_df.set_index('date', inplace=True)
+        if not results_df.empty:
+            results_df.set_index('date', inplace=True)
         return results_df
 
 
-option_data = pd.read_csv('CleanedData_options.csv', index_col=0)
-future_data = pd.read_csv('CleanedData_futures.csv', index_col=0)
-trading_calender = option_data['date'].unique()
-trading_calender.sort()
-
-start_date = '2022-09-01'
-end_date = '2024-09-30'
-ZJS_Exchange = Exchange('ZJS', trading_calender, ExchangeTypes.Option, start_date, end_date,
-                        future_data.set_index(['date', 'uni_id']),
-                        config_backtest_id)
-ZJS_Broker = Broker(init_cash=0, exchange=ZJS_Exchange)
-ZJS_Strategy = Strategy(broker=ZJS_Broker, exchange=ZJS_Exchange)
-
-results_df = ZJS_Strategy.run()
-results_df['cumulative_return'] = (1 + results_df['daily_return']).cumprod() - 1
+def build_strategy(market_data, start_date='2022-09-01', end_date='2024-09-30', init_cash=0,
+                   backtest_ids=config_backtest_id, prefetch=False, record_daily=True):
+    """
+    Wire an exchange, a broker and the strategy over [start_date, end_date] on a loaded MarketData.
+    With prefetch, the next days' data is prepared in the background while the strategy runs.
+    With MarketData(stream_options=True), only the options of the window are read, a chunk at a time.
+    """
+    exchange_cls = PipelinedExchange if prefetch else Exchange
+    daily_source = market_data.options_window(start_date, end_date) if market_data.stream_options else None
+    exchange = exchange_cls(config_exchange_symbol, market_data.trading_calender, ExchangeTypes.Option, start_date,
+                            end_date, market_data, backtest_ids, daily_source)
+    broker = Broker(init_cash=init_cash, exchange=exchange)
+    return Strategy(broker=broker, exchange=exchange, market_data=market_data, record_daily=record_daily)
 
 
-########################plot##############################################
-def p_lines_multicol(positions_df, h=400, w=800):
+def run_backtest(market_data, start_date='2022-09-01', end_date='2024-09-30', init_cash=0,
+                 backtest_ids=config_backtest_id, progress=True, prefetch=False):
+    """
+    Run the strategy and return the daily results.
     """
-    Create a multi-column line plot for asset positions over time.
+    strategy = build_strategy(market_data, start_date, end_date, init_cash, backtest_ids, prefetch)
+    try:
+        results_df = strategy.run(progress=progress)
+    finally:
+        strategy.exchange.close()
+    # An empty window (e.g. start_date after end_date) gives an empty frame
+    if not results_df.empty:
+        results_df['cumulative_return'] = (1 + results_df['daily_return']).cumprod() - 1
+    return results_df
 
-    Parameters:
-    - positions_df: DataFrame containing asset positions with dates as the index.
-    - h: Height of the plot.
-    - w: Width of the plot.
 
-    Returns:
-    - fig: The Plotly figure object.
+def run_summary(market_data, start_date='2022-09-01', end_date='2024-09-30', init_cash=0,
+                backtest_ids=config_backtest_id, progress=False, prefetch=False):
     """
-    fig = go.Figure()
-
-    # Create a line trace for each asset
-    for asset in positions_df.columns:
-        fig.add_trace(go.Scatter(
-            x=positions_df.index,
-            y=positions_df[asset],
-            mode='lines+markers',
-            name=asset,
-            showlegend=True  # Show legend for asset positions
-        ))
-
-    # Customize the layout
-    fig.update_layout(
-        title='Asset Positions Over Time',
-        xaxis_title='Date',
-        yaxis_title='Shares Held',
-        height=h,
-        width=w,
-        xaxis=dict(type='date'),
-        legend_title='Assets'
-    )
-
-    return fig
-
-
-def plot_all(results_df):
-    results_dir = './plots/temp'
-
+    Run the strategy without storing daily results and return the summary metrics.
+    """
+    strategy = build_strategy(market_data, start_date, end_date, init_cash, backtest_ids, prefetch,
+                              record_daily=False)
     try:
-        os.makedirs(results_dir, exist_ok=True)
-    except OSError as e:
-        print(f"Error creating directory {results_dir}: {e}")
-        return
-
-    # Convert positions to a DataFrame where each column is an asset and values are numeric quantities held
-    positions_list = results_df['positions'].tolist()
-    positions_df = pd.DataFrame([{k: v['shares'] for k, v in day.items()} for day in positions_list],
-                                index=results_df.index)
-
-    # Create a subplot figure
-    fig = make_subplots(rows=2, cols=2, subplot_titles=(
-        'Asset Positions', 'Portfolio Value', 'Cumulative Returns', 'Underlying Cumulative Return'))
-
-    # Add asset positions plot
-    for asset in positions_df.columns:
-        fig.add_trace(go.Scatter(
-            x=positions_df.index,
-            y=positions_df[asset],
-            mode='lines+markers',
-            name=asset,
-            showlegend=True  # Show legend for asset positions
-        ), row=1, col=1)
-
-    # Add vertical lines for events
-    for idx, row in results_df.iterrows():
-        if row['event'] == '移仓换月':
-            fig.add_vline(x=idx, line_color='red', line_width=2, opacity=0.7, row=1, col=1)
-        elif row['event'] == '上涨超过百分之五':
-            fig.add_vline(x=idx, line_color='yellow', line_width=2, opacity=0.7, row=1, col=1)
-
-    # Add portfolio value plot
-    fig.add_trace(go.Scatter(
-        x=results_df.index,
-        y=results_df['portfolio_value'],
-        mode='lines',
-        name='Portfolio Value',
-        showlegend=True  # Show legend for portfolio value
-    ), row=1, col=2)
-
-    fig.add_trace(go.Scatter(
-        x=results_df.index,
-        y=results_df['cash'],
-        mode='lines',
-        name='cash',
-        showlegend=True  # Show legend for portfolio value
-    ), row=1, col=2)
-
-    # Add cumulative returns plot
-    fig.add_trace(go.Scatter(
-        x=results_df.index,
-        y=results_df['cumulative_return'],
-        mode='lines',
-        name='Cumulative Return',
-        showlegend=True  # Show legend for cumulative return
-    ), row=2, col=1)
-
-    # Add underlying cumulative return plot
-    fig.add_trace(go.Scatter(
-        x=results_df.index,
-        y=results_df['underlying_cumulative_return'],
-        mode='lines',
-        name='Underlying Cumulative Return',
-        showlegend=True  # Show legend for underlying cumulative return
-    ), row=2, col=2)
-
-    # Customize layout for the overall figure
-    fig.update_layout(
-        title="Investment Strategy Overview",
-        xaxis_title="Date",
-        height=800,
-        width=1400,
-        showlegend=True
-    )
-
-    return fig
-
-
-# Prepare your data (assuming future_data and config_backtest_id are defined)
-filtered_future_data = future_data[future_data['uni_id'].str.startswith(config_backtest_id[0])]
-sorted_future_data = (filtered_future_data
-                      .sort_values(by=['date', 'uni_id'])
-                      .groupby('date', as_index=False)
-                      .first())
-
-merged_results = pd.merge(sorted_future_data[['date', 'close', 'uni_id']],
-                          results_df,
-                          left_on='date',
-                          right_index=True,
-                          how='right')
-
-merged_results['underlying_return'] = merged_results['close'].pct_change()
-merged_results['underlying_cumulative_return'] = (1 + merged_results['underlying_return']).cumprod() - 1
-merged_results = merged_results.set_index('date')
-
-# Create and show the combined plot
-fig = plot_all(merged_results)
-fig.show()
-# fig.write_html("plot_figure_50.html")
+        strategy.run(progress=progress)
+    finally:
+        strategy.exchange.close()
+    return strategy.metrics.summary()
+
+
+def main(start_date='2022-09-01', end_date='2024-09-30', market_data=None, plot=True, use_cache=True):
+    market_data = market_data if market_data is not None else MarketData()
+    if use_cache:
+        from ResultCache import ResultCache
+        results_df = ResultCache().run(market_data, start_date, end_date)
+    else:
+        results_df = run_backtest(market_data, start_date, end_date)
+
+    if plot:
+        # Plotting dependencies are only imported when a plot is requested
+        from Plotting import merge_underlying_returns, plot_all
+        merged_results = merge_underlying_returns(results_df, market_data, config_backtest_id[0])
+        fig = plot_all(merged_results)
+        fig.show()
+        # fig.write_html("plot_figure_50.html")
+    return results_df
+
+
+if __name__ == '__main__':
+    main()